@@ -0,0 +1,47 @@
+"""
+Async login for ASGI deployments. It answers exactly like LoginView, but awaits
+the hashing pool rather than holding a thread while the password is checked, so
+a burst of logins does not tie up the server's sync threads.
+"""
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from . import hashing
+from .models import Account
+from .serializers import LoginSerializer
+
+
+@csrf_exempt  # Token-authenticated API, like the DRF views.
+@require_POST
+async def login(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse({"success": False, "error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    account = await Account.objects.filter(email=serializer.validated_data['email']).afirst()
+    try:
+        is_correct = await hashing.acheck_password(account, serializer.validated_data['password'])
+    except hashing.HashingPoolFull:
+        response = JsonResponse({"success": False, "error": "Too many logins in progress, try again shortly."},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = '1'
+        return response
+    if not is_correct:
+        return JsonResponse({"success": False, "error": "Invalid email or password."}, status=401)
+    if account.role == 'staff' and not account.is_approved:
+        return JsonResponse({"success": False, "error": "Staff not approved by admin."}, status=403)
+
+    token, _ = await Token.objects.aget_or_create(user=account)
+    return JsonResponse({
+        "token": token.key,
+        "user": {"id": account.id, "email": account.email, "username": account.username, "role": account.role},
+    })
@@ -0,0 +1,115 @@
+"""
+Token authentication backed by the Django cache.
+
+A token's user is looked up once and its auth-relevant fields cached under the
+token key, so authenticated requests make no auth queries while the entry
+lives. Each entry records the token's version stamp, read before the user row;
+account and token changes bump the stamps of the user's tokens once they
+commit (see accounts/signals.py), so an entry filled from a row read before a
+change is never served after it. Anything that writes accounts without
+signals, such as bulk_update(), must call invalidate_user_tokens() itself once
+the write commits.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import Account
+
+TOKEN_KEY = 'accounts:token:{}'
+TOKEN_VERSION_KEY = 'accounts:token:{}:version'
+# Enough for permission checks and for using request.user as a foreign key;
+# any other field is loaded from the database on first access.
+CACHED_FIELDS = ['id', 'email', 'username', 'role', 'is_approved', 'is_active_staff', 'is_active', 'is_staff', 'is_superuser']
+
+
+def _fields(token):
+    return {field: getattr(token.user, field) for field in CACHED_FIELDS}
+
+
+def _keys(key):
+    return TOKEN_KEY.format(key), TOKEN_VERSION_KEY.format(key)
+
+
+def _current(key, values):
+    """The cached fields if they are as new as the token's version, and that version."""
+    entry_key, version_key = _keys(key)
+    entry, version = values.get(entry_key), values.get(version_key)
+    if entry is not None and entry['version'] == version:
+        return entry['fields'], version
+    return None, version
+
+
+def _user(fields):
+    if not fields['is_active']:
+        raise AuthenticationFailed('User inactive or deleted.')
+    # from_db() expects values in model field order, with deferred fields left out.
+    names = [field.attname for field in Account._meta.concrete_fields if field.attname in fields]
+    return Account.from_db('default', names, [fields[name] for name in names])
+
+
+def authenticate_token(key):
+    """Return (user, token) for a token key, from the cache when possible."""
+    entry_key, version_key = _keys(key)
+    fields, version = _current(key, cache.get_many([entry_key, version_key]))
+    if fields is None:
+        # The version is read before the row: if the row changes after that, the entry is stale already.
+        if version is None:
+            cache.add(version_key, time.time_ns(), None)
+            version = cache.get(version_key)
+        try:
+            fields = _fields(Token.objects.select_related('user').get(key=key))
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+        cache.set(entry_key, {'fields': fields, 'version': version}, settings.TOKEN_CACHE_TIMEOUT)
+    user = _user(fields)
+    return user, Token(key=key, user=user)
+
+
+def invalidate_tokens(keys):
+    """Drop cached lookups of the given token keys; call it after the change commits."""
+    version = time.time_ns()
+    cache.set_many({TOKEN_VERSION_KEY.format(key): version for key in keys}, None)
+    cache.delete_many([TOKEN_KEY.format(key) for key in keys])
+
+
+def invalidate_user_tokens(user_ids):
+    """Drop cached token lookups for the given users; call it after the change commits."""
+    invalidate_tokens(list(Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """DRF TokenAuthentication that serves the token's user from the cache."""
+
+    def authenticate_credentials(self, key):
+        return authenticate_token(key)
+
+
+async def aauthenticate(request):
+    """
+    Resolve an ``Authorization: Token <key>`` header to an active user for async
+    views, following DRF's TokenAuthentication. Returns None without a token
+    and raises AuthenticationFailed for a bad one.
+    """
+    parts = request.headers.get('Authorization', '').split()
+    if not parts or parts[0].lower() != 'token':
+        return None
+    if len(parts) != 2:
+        raise AuthenticationFailed('Invalid token header. Token string should not contain spaces.')
+    key = parts[1]
+    entry_key, version_key = _keys(key)
+    fields, version = _current(key, await cache.aget_many([entry_key, version_key]))
+    if fields is None:
+        if version is None:
+            await cache.aadd(version_key, time.time_ns(), None)
+            version = await cache.aget(version_key)
+        try:
+            fields = _fields(await Token.objects.select_related('user').aget(key=key))
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+        await cache.aset(entry_key, {'fields': fields, 'version': version}, settings.TOKEN_CACHE_TIMEOUT)
+    return _user(fields)
@@ -0,0 +1,102 @@
+"""
+Batch profile updates, e.g. a nightly CRM sync.
+
+The target accounts are loaded and locked in one query. Each line is validated
+with UserProfileSerializer and applied in memory, in line order, so two lines
+for the same user both take effect. Changed accounts are then written with one
+bulk_update of the changed columns, and their edit history with one
+bulk_create, in a single transaction.
+"""
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .authentication import invalidate_user_tokens
+from .cache import bump_directory_version
+from .models import Account, UserProfileEditHistory
+from .serializers import UserProfileSerializer
+
+PROFILE_FIELDS = ['phone', 'nickname', 'address_street', 'address_house', 'address_district']
+
+
+def apply_profile_changes(account, values):
+    """Set the profile fields in ``values`` on ``account``; return [(field, old, new)] for those that changed."""
+    changes = []
+    for field in PROFILE_FIELDS:
+        if field in values:
+            old_value, new_value = getattr(account, field), values[field]
+            if old_value != new_value:
+                setattr(account, field, new_value)
+                changes.append((field, old_value, new_value))
+    return changes
+
+
+def history_rows(account, changes):
+    return [
+        UserProfileEditHistory(user=account, field_changed=field, old_value=old_value, new_value=new_value)
+        for field, old_value, new_value in changes
+    ]
+
+
+def _user_id(line):
+    value = line.get('user_id') if isinstance(line, dict) else None
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ProfileUpdateBatch:
+    def __init__(self, lines):
+        self.lines = lines
+        self.results = []
+
+    @property
+    def has_errors(self):
+        return any(result['status'] == 'error' for result in self.results)
+
+    @transaction.atomic
+    def process(self):
+        """Validate, apply and write the batch in one transaction. Returns the per-line results."""
+        user_ids = {user_id for user_id in map(_user_id, self.lines) if user_id}
+        # Locked in id order, so concurrent batches cannot deadlock or record stale old values.
+        accounts = {
+            account.id: account
+            for account in Account.objects.select_for_update().filter(id__in=user_ids, role='user').order_by('id')
+        }
+
+        # One serializer validates every line; building one per line would dominate large batches.
+        validator = UserProfileSerializer(partial=True)
+        changed, fields, history = {}, set(), []
+        for number, line in enumerate(self.lines, start=1):
+            user_id = _user_id(line)
+            result = {'line': number, 'user_id': user_id}
+            self.results.append(result)
+            if not isinstance(line, dict):
+                result.update(status='error', error='Each line must be an object.')
+                continue
+            if user_id not in accounts:
+                result.update(status='error', error='User not found or not a user.')
+                continue
+            account = accounts[user_id]
+            try:
+                values = validator.run_validation({k: v for k, v in line.items() if k in PROFILE_FIELDS})
+            except ValidationError as exc:
+                result.update(status='error', error=exc.detail)
+                continue
+
+            changes = apply_profile_changes(account, values)
+            result['status'] = 'updated' if changes else 'unchanged'
+            result['changes'] = [{'field': field, 'old': old, 'new': new} for field, old, new in changes]
+            if changes:
+                changed[account.id] = account
+                fields.update(field for field, _, _ in changes)
+                history += history_rows(account, changes)
+
+        if changed:
+            Account.objects.bulk_update(changed.values(), sorted(fields), batch_size=1000)
+            UserProfileEditHistory.objects.bulk_create(history, batch_size=1000)
+            # bulk_update() sends no post_save, so do what the account signals would.
+            transaction.on_commit(lambda: (invalidate_user_tokens(changed), bump_directory_version()))
+        return self.results
@@ -0,0 +1,32 @@
+"""
+Cached user directory counts. Counting hundreds of thousands of accounts on
+every page is the slowest part of the directory, so each filter combination's
+count is cached. Keys include a version stamp that account writes bump, so
+signups and profile changes refresh the counts on the next read.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from inventory.cache import get_version
+
+DIRECTORY_VERSION_KEY = 'accounts:directory:version'
+COUNT_KEY = 'accounts:count:{}'
+
+
+def bump_directory_version():
+    cache.set(DIRECTORY_VERSION_KEY, time.time_ns(), None)
+
+
+def cached_count(queryset, params):
+    """Count ``queryset``, cached under the directory version and its filter ``params``."""
+    filters = sorted((name, params.get(name, '')) for name in ('role', 'search'))
+    digest = hashlib.md5(f'{get_version(DIRECTORY_VERSION_KEY)}:{filters}'.encode()).hexdigest()
+    key = COUNT_KEY.format(digest)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.ACCOUNT_COUNT_CACHE_TIMEOUT)
+    return count
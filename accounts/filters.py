@@ -0,0 +1,18 @@
+from django.db.models import Q
+
+
+def filter_accounts(queryset, params):
+    """
+    Apply the user directory query filters: role (comma-separated) and search,
+    a case-insensitive prefix of the email or username, or a phone number prefix.
+    """
+    role = params.get('role')
+    if role:
+        queryset = queryset.filter(role__in=role.split(','))
+
+    search = params.get('search', '').strip()
+    if search:
+        queryset = queryset.filter(
+            Q(email__istartswith=search) | Q(username__istartswith=search) | Q(phone__startswith=search)
+        )
+    return queryset
@@ -0,0 +1,32 @@
+"""
+Password hashers whose work factors come from settings, so the cost of a login
+can be tuned per deployment (PBKDF2_ITERATIONS, ARGON2_*). Changing a factor
+makes must_update() true for existing hashes, and they are rehashed with the
+new factor on the next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # Same algorithm name as Django's hasher, so existing hashes stay valid.
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with configurable cost; requires the argon2-cffi package."""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
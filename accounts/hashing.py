@@ -0,0 +1,70 @@
+"""
+Password checks run on a bounded pool of hashing threads.
+
+Hashing is CPU-bound and slow by design. hashlib and argon2-cffi release the
+GIL while they hash, so a thread pool sized to the CPU count keeps every core
+busy without process start-up or pickling costs. At most
+PASSWORD_HASHING_WORKERS + PASSWORD_HASHING_QUEUE checks may be running or
+waiting at once. Beyond that, HashingPoolFull is raised straight away. During a
+login storm, clients then get a fast 503 and can retry, instead of queueing
+behind minutes of hashing.
+
+The pool threads never touch the database. When a hash needs upgrading, the new
+hash is computed in the pool and saved by the caller.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, make_password, verify_password
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+def _verify(password, encoded):
+    # An unusable hash still runs the default hasher once, to hide missing accounts.
+    is_correct, must_update = verify_password(password, encoded or UNUSABLE_PASSWORD_PREFIX)
+    return is_correct, make_password(password) if is_correct and must_update else None
+
+
+def submit(password, encoded):
+    """
+    Queue a check of ``password`` against ``encoded`` (None when there is no
+    account, which still costs one hash so unknown emails are not faster).
+    Returns a future of (is_correct, new_hash_or_None).
+    """
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(settings.PASSWORD_HASHING_WORKERS, thread_name_prefix='password-hashing')
+            _slots = threading.BoundedSemaphore(settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE)
+    if not _slots.acquire(blocking=False):
+        raise HashingPoolFull()
+    future = _pool.submit(_verify, password, encoded)
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def check_password(account, password):
+    """Check a login password on the pool, rehashing the account when its hash is outdated."""
+    is_correct, new_hash = submit(password, account.password if account else None).result()
+    if account is not None and new_hash:
+        account.password = new_hash
+        account.save(update_fields=['password'])
+    return is_correct
+
+
+async def acheck_password(account, password):
+    """check_password() for async views; the event loop is free while the pool hashes."""
+    is_correct, new_hash = await asyncio.wrap_future(submit(password, account.password if account else None))
+    if account is not None and new_hash:
+        account.password = new_hash
+        await account.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,176 @@
+"""
+Bulk account import from CSV or NDJSON, shared by the import_accounts command
+and the admin import endpoint.
+
+Rows are streamed, never loaded whole. Each row is checked against sets of the
+existing emails and usernames, loaded once, so duplicates, including those
+within the file, cost no queries. Accepted rows are collected into chunks.
+Each chunk's passwords are hashed in a process pool, since hashing is by far
+the slowest step, and the chunk is inserted with one bulk_create. After every
+chunk, ``on_chunk`` receives the last line written; passing that line back as
+``start_line`` resumes an interrupted import.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .bulk import PROFILE_FIELDS
+from .cache import bump_directory_version
+from .models import Account
+
+ROLES = {role for role, _ in Account.ROLE_CHOICES}
+FORMATS = ('csv', 'ndjson')
+
+
+def read_rows(stream, format, encoding='utf-8'):
+    """Yield (line number, row dict or None when unparsable) from a binary stream."""
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        if format == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield number, row if isinstance(row, dict) else None
+    finally:
+        text.detach()  # Leave the caller's stream open.
+
+
+def hashing_pool(workers):
+    # Spawned, not forked: children must not share the parent's database
+    # connections or threads (the endpoint runs inside a web worker).
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def shared_hashing_pool():
+    """
+    The pool every import request in this process hashes on, started on first
+    use with ACCOUNT_IMPORT_WORKERS processes. Concurrent imports queue for the
+    same processes rather than each starting (and paying for) its own.
+    """
+    global _pool
+    with _lock:
+        # A pool whose process died refuses new work for good, so replace it.
+        if _pool is None or _pool._broken:
+            _pool = hashing_pool(settings.ACCOUNT_IMPORT_WORKERS)
+    return _pool
+
+
+class AccountImporter:
+    """Import accounts, hashing on ``pool`` (an executor, or None to hash in-process)."""
+
+    def __init__(self, pool, chunk_size=1000, start_line=0, on_chunk=None, max_errors=1000):
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.start_line = start_line
+        self.on_chunk = on_chunk
+        self.max_errors = max_errors
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.last_line = start_line
+        self.emails = set(Account.objects.values_list('email', flat=True).iterator(chunk_size=10000))
+        self.usernames = set(Account.objects.values_list('username', flat=True).iterator(chunk_size=10000))
+
+    def run(self, rows):
+        """Import (line number, row) pairs; returns self for the counts and errors."""
+        chunk, number = [], self.start_line
+        for number, row in rows:
+            if number <= self.start_line:
+                continue
+            account, password, error = self.build(row)
+            if error:
+                self.skipped += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({'line': number, 'error': error})
+                continue
+            chunk.append((number, account, password))
+            if len(chunk) >= self.chunk_size:
+                self.write(chunk)
+                chunk = []
+        if chunk:
+            self.write(chunk)
+        if number > self.last_line:
+            # Only rejected rows follow the last chunk; a resume need not read them again.
+            self.last_line = number
+            if self.on_chunk:
+                self.on_chunk(number)
+        if self.created:
+            bump_directory_version()  # bulk_create() sends no post_save.
+        return self
+
+    def build(self, row):
+        """Validate a row; return (unsaved account, raw password, error message)."""
+        if row is None:
+            return None, None, 'Row could not be parsed.'
+        values = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+        email = Account.objects.normalize_email(values.get('email') or '')
+        username = values.get('username') or ''
+        role = values.get('role') or 'user'
+        password = values.get('password') or None
+        try:
+            validate_email(email)
+        except ValidationError:
+            return None, None, 'A valid email is required.'
+        if not username or len(username) > 150:
+            return None, None, 'username is required and must be at most 150 characters.'
+        if role not in ROLES:
+            return None, None, f"role must be one of {', '.join(sorted(ROLES))}."
+        if password is not None and len(password) < 6:
+            return None, None, 'password must be at least 6 characters.'
+        for field in PROFILE_FIELDS:
+            value = values.get(field)
+            if value and len(str(value)) > Account._meta.get_field(field).max_length:
+                return None, None, f'{field} is too long.'
+        if email in self.emails:
+            return None, None, 'Email already exists.'
+        if username in self.usernames:
+            return None, None, 'Username already exists.'
+
+        self.emails.add(email)
+        self.usernames.add(username)
+        # Same approval rules as AccountSerializer.create().
+        approved = role == 'user'
+        account = Account(
+            email=email, username=username, role=role, is_approved=approved, is_active_staff=approved,
+            **{field: str(values[field]) for field in PROFILE_FIELDS if values.get(field)},
+        )
+        return account, password, None
+
+    def write(self, chunk):
+        passwords = [password for _, _, password in chunk if password is not None]
+        if self.pool is None:
+            hashes = map(make_password, passwords)
+        else:
+            hashes = self.pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 32))
+        hashes = iter(hashes)
+        accounts = []
+        for _, account, password in chunk:
+            account.password = next(hashes) if password is not None else make_password(None)
+            accounts.append(account)
+        with transaction.atomic():
+            Account.objects.bulk_create(accounts)
+        self.created += len(accounts)
+        self.last_line = chunk[-1][0]
+        if self.on_chunk:
+            self.on_chunk(self.last_line)
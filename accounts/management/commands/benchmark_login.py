@@ -0,0 +1,90 @@
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import verify_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from accounts.models import Account
+
+PASSWORD = 'bench-login-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login throughput per CPU core for each password hasher: raw hash checks on one thread, '
+        'then logins through LoginView from concurrent clients, which share the bounded hashing pool. '
+        'Creates or reuses the bench-login@example.com account in the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', default=['pbkdf2', 'argon2'], choices=['pbkdf2', 'argon2'])
+        parser.add_argument('--logins', type=int, default=200, help='Logins per hasher')
+        parser.add_argument('--clients', type=int, default=os.cpu_count() * 4, help='Concurrent login clients')
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        logging.getLogger('inventract_backend.middleware').setLevel(logging.ERROR)
+        cores = os.cpu_count() or 1
+        self.stdout.write(
+            f"{cores} core(s), {settings.PASSWORD_HASHING_WORKERS} hashing worker(s), queue {settings.PASSWORD_HASHING_QUEUE}, "
+            f"{options['clients']} clients, {options['logins']} logins per hasher"
+        )
+        row = '{:<8} {:>14} {:>12} {:>14} {:>8} {:>8} {:>6}'
+        self.stdout.write(row.format('Hasher', 'hashes/s/core', 'logins/s', 'logins/s/core', 'p50 ms', 'p99 ms', '503s'))
+        for name in options['hashers']:
+            if name == 'argon2' and not importlib.util.find_spec('argon2'):
+                self.stdout.write(self.style.WARNING(f'{name}: skipped, install "argon2-cffi"'))
+                continue
+            hasher = settings.PASSWORD_HASHER_CHOICES[name]
+            others = [path for path in settings.PASSWORD_HASHERS if path != hasher]
+            with override_settings(PASSWORD_HASHERS=[hasher, *others]):
+                account = self.account()
+                hash_rate = self.hash_rate(account.password)
+                timings, rejected, elapsed = self.logins(options)
+            self.stdout.write(row.format(
+                name, f'{hash_rate:.1f}', f'{len(timings) / elapsed:.1f}', f'{len(timings) / elapsed / cores:.1f}',
+                f'{statistics.median(timings):.1f}', f'{statistics.quantiles(timings, n=100)[98]:.1f}', rejected,
+            ))
+
+    def account(self):
+        account = Account.objects.filter(email='bench-login@example.com').first() or Account(
+            email='bench-login@example.com', username='bench-login', role='user',
+        )
+        account.set_password(PASSWORD)
+        account.save()
+        return account
+
+    def hash_rate(self, encoded):
+        started, checks = time.perf_counter(), 0
+        while checks < 5 or time.perf_counter() - started < 2:
+            verify_password(PASSWORD, encoded)
+            checks += 1
+        return checks / (time.perf_counter() - started)
+
+    def logins(self, options):
+        body = json.dumps({'email': 'bench-login@example.com', 'password': PASSWORD})
+
+        def login(_):
+            started = time.perf_counter()
+            response = Client().post('/api/accounts/login/', body, content_type='application/json')
+            if response.status_code not in (200, 503):
+                raise CommandError(f'Login returned {response.status_code}: {response.content[:200]!r}')
+            return response.status_code, (time.perf_counter() - started) * 1000
+
+        login(None)  # warm up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['clients']) as pool:
+            results = list(pool.map(login, range(options['logins'])))
+        elapsed = time.perf_counter() - started
+        timings = [ms for code, ms in results if code == 200]
+        if not timings:
+            raise CommandError('Every login was rejected; raise PASSWORD_HASHING_QUEUE or lower --clients.')
+        return timings, len(results) - len(timings), elapsed
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from accounts.cache import bump_directory_version
 from accounts.models import Account
 from faker import Faker
 import random
@@ -9,35 +10,50 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--count', type=int, default=10, help='Number of users to create')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed generates the same accounts')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--password', default='test12345', help='Password shared by every generated account')
 
     def handle(self, *args, **kwargs):
+        count, seed, batch_size = kwargs['count'], kwargs['seed'], kwargs['batch_size']
+        rng = random.Random(seed)
         fake = Faker()
-        count = kwargs['count']
-        roles = ['user', 'staff']
+        fake.seed_instance(seed)
+        # Faker is slow per call; draw profile details from small pools instead.
+        nicknames = [fake.first_name() for _ in range(500)]
+        phones = [fake.numerify('01#########') for _ in range(500)]
+        streets = [fake.street_name() for _ in range(500)]
+        districts = [fake.city() for _ in range(100)]
+        # Hashing is deliberately slow, so every account shares one precomputed hash.
+        password = make_password(kwargs['password'])
 
-        for _ in range(count):
-            email = fake.unique.email()
-            password = 'test12345'
-            role = random.choice(roles)
-            is_approved = True if role == 'user' else False
-            is_active_staff = True
+        # Usernames and emails are derived from the seed and index, so re-running with the
+        # same seed skips existing accounts (ignore_conflicts) instead of checking each one.
+        before = Account.objects.count()
+        batch = []
+        for i in range(count):
+            role = rng.choice(['user', 'staff'])
+            username = f"{role}-{seed}-{i}"
+            batch.append(Account(
+                email=f"{username}@example.com",
+                username=username,
+                password=password,
+                role=role,
+                is_approved=role == 'user',
+                is_active_staff=True,
+                nickname=rng.choice(nicknames),
+                phone=rng.choice(phones),
+                address_street=rng.choice(streets),
+                address_house=str(rng.randint(1, 300)),
+                address_district=rng.choice(districts),
+            ))
+            if len(batch) >= batch_size:
+                Account.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Account.objects.bulk_create(batch, ignore_conflicts=True)
+        bump_directory_version()  # bulk_create() sends no post_save.
 
-            # Generate a unique username
-            while True:
-                username = f"{role}{fake.unique.random_number(digits=6)}"
-                if not Account.objects.filter(username=username).exists():
-                    break
-
-            if not Account.objects.filter(email=email).exists():
-                account = Account.objects.create(
-                    email=email,
-                    username=username,
-                    password=make_password(password),
-                    role=role,
-                    is_approved=is_approved,
-                    is_active_staff=is_active_staff,
-                    raw_password=password  # Store plain password for testing
-                )
-                self.stdout.write(self.style.SUCCESS(
-                    f"Created {role}: {email} | username: {username} | password: {password}"
-                ))
+        created = Account.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} accounts ({count - created} already existed) | password: {kwargs['password']}"
+        ))
@@ -0,0 +1,54 @@
+import json
+import os
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importers import FORMATS, AccountImporter, hashing_pool, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Import accounts from a CSV (with a header row) or NDJSON file with email, username and optionally '
+        'password, role, phone, nickname, address_street, address_house and address_district. Passwords are '
+        'hashed in worker processes and rows inserted in chunks. Progress is checkpointed after every chunk; '
+        'running the command again resumes after the last chunk written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file')
+        parser.add_argument('--format', choices=FORMATS, help='File format; defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Accounts per insert')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Password hashing processes')
+        parser.add_argument('--checkpoint', help='Checkpoint file; defaults to <path>.checkpoint')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'{path} does not exist.')
+        format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'ndjson')
+        checkpoint = Path(options['checkpoint'] or f'{path}.checkpoint')
+
+        start_line = 0
+        if checkpoint.exists() and not options['restart']:
+            start_line = json.loads(checkpoint.read_text())['line']
+            self.stdout.write(f'Resuming after line {start_line} (from {checkpoint}).')
+
+        def save_checkpoint(line):
+            partial = checkpoint.with_name(checkpoint.name + '.tmp')
+            partial.write_text(json.dumps({'line': line}))
+            os.replace(partial, checkpoint)
+
+        with hashing_pool(options['workers']) as pool, path.open('rb') as stream:
+            importer = AccountImporter(
+                pool, chunk_size=options['chunk_size'], start_line=start_line, on_chunk=save_checkpoint,
+            ).run(read_rows(stream, format))
+
+        for error in importer.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if importer.skipped > len(importer.errors):
+            self.stderr.write(f'... and {importer.skipped - len(importer.errors)} more rejected rows.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.created} accounts, rejected {importer.skipped}; last line {importer.last_line}.'
+        ))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Account',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('username', models.CharField(max_length=150, unique=True)),
+                ('password', models.CharField(max_length=128)),
+                ('role', models.CharField(choices=[('staff', 'Staff'), ('user', 'User')], default='user', max_length=10)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('is_active_staff', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('nickname', models.CharField(blank=True, max_length=50, null=True)),
+                ('address_street', models.CharField(blank=True, max_length=255, null=True)),
+                ('address_house', models.CharField(blank=True, max_length=50, null=True)),
+                ('address_district', models.CharField(blank=True, max_length=100, null=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserProfileEditHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('edited_at', models.DateTimeField(auto_now_add=True)),
+                ('field_changed', models.CharField(max_length=50)),
+                ('old_value', models.TextField(blank=True, null=True)),
+                ('new_value', models.TextField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edit_histories', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['role', 'id'], name='account_role_id_idx'),
+        ),
+    ]
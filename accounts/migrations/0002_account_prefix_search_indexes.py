@@ -0,0 +1,48 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import migrations, models
+from django.db.models.functions import Collate, Upper
+
+
+def prefix_indexes(vendor):
+    """Indexes for the directory's prefix searches on email, username (case-insensitive) and phone."""
+    if vendor == 'postgresql':
+        # istartswith compiles to UPPER(col::text) LIKE UPPER('prefix%'); the pattern
+        # opclasses let LIKE prefixes use the index whatever the database collation.
+        return [
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='account_email_prefix_idx'),
+            models.Index(OpClass(Upper('username'), name='text_pattern_ops'), name='account_username_prefix_idx'),
+            models.Index(fields=['phone'], opclasses=['varchar_pattern_ops'], name='account_phone_prefix_idx'),
+        ]
+    if vendor == 'sqlite':
+        # SQLite's LIKE is case-insensitive and can only use NOCASE indexes.
+        return [
+            models.Index(Collate('email', 'NOCASE'), name='account_email_prefix_idx'),
+            models.Index(Collate('username', 'NOCASE'), name='account_username_prefix_idx'),
+            models.Index(Collate('phone', 'NOCASE'), name='account_phone_prefix_idx'),
+        ]
+    return []
+
+
+def add_indexes(apps, schema_editor):
+    account = apps.get_model('accounts', 'Account')
+    for index in prefix_indexes(schema_editor.connection.vendor):
+        schema_editor.add_index(account, index)
+
+
+def remove_indexes(apps, schema_editor):
+    account = apps.get_model('accounts', 'Account')
+    for index in prefix_indexes(schema_editor.connection.vendor):
+        schema_editor.remove_index(account, index)
+
+
+class Migration(migrations.Migration):
+    # The indexes differ per database, so they stay out of the model state
+    # (Account.Meta) to keep makemigrations' output the same everywhere.
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -49,6 +49,12 @@ class Account(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta:
+        # The user directory pages by id within a role and prefix-searches email,
+        # username (both case-insensitively) and phone. The prefix search indexes
+        # differ per database, so a migration adds them (accounts/migrations/0002).
+        indexes = [models.Index(fields=['role', 'id'], name='account_role_id_idx')]
+
     def __str__(self):
         return self.email
 
@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AccountCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the user directory. ``ordering`` may be id, -id,
+    email, -email, username or -username; all are unique, so no tie-breaker is
+    needed.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering_param = 'ordering'
+    allowed_orderings = {'id', '-id', 'email', '-email', 'username', '-username'}
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        return (ordering if ordering in self.allowed_orderings else self.ordering,)
@@ -34,6 +34,14 @@ class AccountSerializer(serializers.ModelSerializer):
         return Account.objects.create_user(**validated_data)
 
 
+class AccountListSerializer(serializers.ModelSerializer):
+    """The user directory's row: identity and role, no profile details."""
+
+    class Meta:
+        model = Account
+        fields = ['id', 'email', 'username', 'role', 'is_approved', 'phone']
+
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
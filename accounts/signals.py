@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from .cache import bump_directory_version
+from .models import Account
+
+
+@receiver([post_save, post_delete], sender=Account)
+def invalidate_account_tokens(sender, instance, **kwargs):
+    # After the commit: a lookup between the write and the commit would cache the old row again.
+    user_id = instance.pk
+    transaction.on_commit(lambda: (invalidate_user_tokens([user_id]), bump_directory_version()))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens([key]))
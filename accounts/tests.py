@@ -1,3 +1,339 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+import io
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from inventory.models import Product
+from . import authentication, hashing, importers
+from .models import Account, UserProfileEditHistory
+
+
+@override_settings(TOKEN_CACHE_TIMEOUT=300)  # Creating accounts hashes passwords for longer than the default.
+class QueryBudgetTests(TestCase):
+    """Listing accounts must not issue a query per account."""
+
+    def setUp(self):
+        admin = Account.objects.create_superuser('admin@example.com', 'admin', None)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=admin).key}'
+
+    def add_accounts(self, count):
+        start = Account.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                Account.objects.create_user(f'user{i}@example.com', f'user{i}', 'test12345')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_user_list(self):
+        self.count_queries('/api/accounts/list/')  # caches the admin's token
+        self.add_accounts(1)
+        before = self.count_queries('/api/accounts/list/')
+        self.add_accounts(10)
+        self.assertEqual(self.count_queries('/api/accounts/list/'), before)
+
+
+class UserDirectoryTests(TestCase):
+    """The user list pages by cursor and filters by role and search prefix."""
+
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            Account.objects.create_user(f'User{i}@example.com', f'user{i}', None, phone=f'0171000000{i}')
+        Account.objects.create_user('staff@example.com', 'staffer', None, role='staff', phone='01900000000')
+        admin = Account.objects.create_superuser('admin@example.com', 'admin', None)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=admin).key}'
+
+    def test_pages_cover_every_account_once(self):
+        url, emails = '/api/accounts/list/?page_size=2', []
+        while url:
+            data = self.client.get(url).json()
+            self.assertEqual(data['total_users'], 6)
+            emails += [user['email'] for user in data['users']]
+            url = data['next']
+        self.assertEqual(len(emails), 6)
+        self.assertNotIn('admin@example.com', emails)
+
+    def test_filters(self):
+        def emails(query):
+            data = self.client.get(f'/api/accounts/list/?{query}').json()
+            self.assertEqual(data['total_users'], len(data['users']))
+            return sorted(user['email'] for user in data['users'])
+
+        self.assertEqual(emails('role=staff'), ['staff@example.com'])
+        self.assertEqual(emails('search=user3'), ['User3@example.com'])
+        self.assertEqual(emails('search=USER1'), ['User1@example.com'])
+        self.assertEqual(emails('search=0171000000'), [f'User{i}@example.com' for i in range(5)])
+        self.assertEqual(emails('search=staff&role=user'), [])
+
+    def test_rows_are_lightweight(self):
+        user = self.client.get('/api/accounts/list/').json()['users'][0]
+        self.assertEqual(set(user), {'id', 'email', 'username', 'role', 'is_approved', 'phone'})
+
+    def test_requires_admin(self):
+        staff = Account.objects.get(email='staff@example.com')
+        self.assertEqual(self.client.get('/api/accounts/list/', HTTP_AUTHORIZATION='').status_code, 401)
+        token = Token.objects.create(user=staff).key
+        self.assertEqual(self.client.get('/api/accounts/list/', HTTP_AUTHORIZATION=f'Token {token}').status_code, 403)
+
+    def test_count_refreshes_after_signup(self):
+        self.assertEqual(self.client.get('/api/accounts/list/').json()['total_users'], 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            Account.objects.create_user('new@example.com', 'new', None)
+        self.assertEqual(self.client.get('/api/accounts/list/').json()['total_users'], 7)
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Token lookups are cached and dropped when the account changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.account = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.product = Product.objects.create(name='Widget', sku='W-1', quantity=0, price=5)
+
+    def login(self):
+        response = self.client.post('/api/accounts/login/', {'email': 'staff@example.com', 'password': 'test12345'})
+        self.assertEqual(response.status_code, 200)
+        return {'HTTP_AUTHORIZATION': f"Token {response.data['token']}"}
+
+    def test_login_returns_token(self):
+        headers = self.login()
+        self.assertEqual(headers, self.login())
+        self.assertTrue(Token.objects.filter(user=self.account).exists())
+
+    def test_cache_hit_makes_no_queries(self):
+        headers = self.login()
+        url = f'/api/inventory/{self.product.id}/'
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, **headers).status_code, 200)
+
+    def test_account_change_invalidates_cache(self):
+        headers = self.login()
+        url = f'/api/inventory/stock-log/{self.product.id}/'
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.account.role = 'user'
+            self.account.save()
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)  # Not committed yet.
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url, **headers).status_code, 403)
+
+    def test_fill_from_before_a_change_is_not_served(self):
+        headers = self.login()
+        key = headers['HTTP_AUTHORIZATION'].split()[1]
+        url = f'/api/inventory/stock-log/{self.product.id}/'
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        # A lookup reads the version and the staff row, then the account changes and commits...
+        cache.delete(authentication.TOKEN_KEY.format(key))
+        version = cache.get(authentication.TOKEN_VERSION_KEY.format(key))
+        fields = authentication._fields(Token.objects.get(key=key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.role = 'user'
+            self.account.save()
+        # ...and only then does the lookup store what it read.
+        cache.set(authentication.TOKEN_KEY.format(key), {'fields': fields, 'version': version})
+        self.assertEqual(self.client.get(url, **headers).status_code, 403)
+
+    def test_deleted_token_is_rejected(self):
+        headers = self.login()
+        url = f'/api/inventory/{self.product.id}/'
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(user=self.account).delete()
+        self.assertEqual(self.client.get(url, **headers).status_code, 401)
+
+
+    def test_deactivated_user_is_rejected(self):
+        headers = self.login()
+        url = f'/api/inventory/{self.product.id}/'
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.is_active = False
+            self.account.save()
+        self.assertEqual(self.client.get(url, **headers).status_code, 401)
+
+    def test_unshared_entries_expire_within_seconds(self):
+        headers = self.login()
+        url = f'/api/inventory/{self.product.id}/'
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        # As seen by another worker, whose own cache the change does not invalidate.
+        Account.objects.filter(pk=self.account.pk).update(is_active=False)
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        if not settings.CACHE_URL:
+            self.assertLessEqual(settings.TOKEN_CACHE_TIMEOUT, 5)
+        later = time.time() + settings.TOKEN_CACHE_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(self.client.get(url, **headers).status_code, 401)
+
+
+class LoginHashingTests(TestCase):
+    """Logins hash on the bounded pool and upgrade outdated hashes."""
+
+    def setUp(self):
+        self.account = Account.objects.create_user('user@example.com', 'user', 'test12345')
+
+    def login(self, url='/api/accounts/login/', password='test12345'):
+        return self.client.post(url, {'email': 'user@example.com', 'password': password}, content_type='application/json')
+
+    def test_outdated_hash_is_upgraded(self):
+        with override_settings(PBKDF2_ITERATIONS=1000):
+            self.assertEqual(self.login().status_code, 200)
+        self.account.refresh_from_db()
+        self.assertTrue(self.account.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.account.check_password('test12345'))
+
+    def test_wrong_password_and_unknown_email(self):
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        response = self.client.post('/api/accounts/login/', {'email': 'nobody@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_full_pool_rejects_login(self):
+        for url in ('/api/accounts/login/', '/api/accounts/login/async/'):
+            with mock.patch.object(hashing, 'submit', side_effect=hashing.HashingPoolFull):
+                response = self.login(url)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+
+    def test_async_login_matches_sync(self):
+        sync, async_ = self.login().json(), self.login('/api/accounts/login/async/').json()
+        self.assertEqual(sync, async_)
+
+
+class BulkProfileUpdateTests(TestCase):
+    """Bulk profile updates write in a fixed number of queries and report every line."""
+
+    def setUp(self):
+        cache.clear()
+        admin = Account.objects.create_superuser('admin@example.com', 'admin', None)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=admin).key}'}
+        self.users = [Account.objects.create_user(f'user{i}@example.com', f'user{i}', None, phone='0100') for i in range(20)]
+
+    def post(self, updates):
+        return self.client.post('/api/accounts/profiles/bulk/', updates, content_type='application/json', **self.headers)
+
+    def test_updates_and_report(self):
+        first, second = self.users[:2]
+        response = self.post([
+            {'user_id': first.id, 'phone': '0199', 'nickname': 'Ann'},
+            {'user_id': second.id, 'phone': '0100'},
+            {'user_id': 999999, 'phone': '0199'},
+            {'user_id': second.id, 'phone': 'x' * 50},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']], ['updated', 'unchanged', 'error', 'error'])
+        self.assertEqual(response.data['results'][0]['changes'], [
+            {'field': 'phone', 'old': '0100', 'new': '0199'}, {'field': 'nickname', 'old': None, 'new': 'Ann'},
+        ])
+        first.refresh_from_db()
+        self.assertEqual((first.phone, first.nickname), ('0199', 'Ann'))
+        self.assertEqual(
+            sorted(UserProfileEditHistory.objects.filter(user=first).values_list('field_changed', flat=True)),
+            ['nickname', 'phone'],
+        )
+        self.assertFalse(UserProfileEditHistory.objects.filter(user=second).exists())
+
+    def test_query_count_does_not_grow(self):
+        def queries(users, phone):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.post([{'user_id': user.id, 'phone': phone} for user in users]).status_code, 200)
+            return len(captured)
+
+        queries(self.users[:1], '0111')  # caches the admin's token
+        self.assertEqual(queries(self.users[:2], '0122'), queries(self.users, '0133'))
+
+    def test_requires_admin(self):
+        self.headers = {}
+        self.assertEqual(self.post([{'user_id': self.users[0].id, 'phone': '0199'}]).status_code, 401)
+
+
+class AccountImportTests(TestCase):
+    """Imports reject bad and duplicate rows without queries and resume after a checkpoint."""
+
+    csv_data = (
+        'email,username,password,role,phone\n'
+        'a@example.com,alice,secret123,user,0171\n'
+        'b@example.com,bob,,staff,\n'
+        'not-an-email,carol,secret123,user,\n'
+        'a@example.com,alice2,secret123,user,\n'
+        'd@example.com,existing,secret123,user,\n'
+        'e@example.com,eve,secret123,admin,\n'
+    )
+
+    def setUp(self):
+        Account.objects.create_user('existing@example.com', 'existing', None)
+
+    def run_import(self, **kwargs):
+        rows = importers.read_rows(io.BytesIO(self.csv_data.encode()), 'csv')
+        return importers.AccountImporter(None, chunk_size=1, **kwargs).run(rows)
+
+    def test_import(self):
+        checkpoints = []
+        importer = self.run_import(on_chunk=checkpoints.append)
+        self.assertEqual((importer.created, importer.skipped), (2, 4))
+        self.assertEqual([error['line'] for error in importer.errors], [4, 5, 6, 7])
+        self.assertEqual(checkpoints, [2, 3, 7])
+        alice, bob = Account.objects.get(username='alice'), Account.objects.get(username='bob')
+        self.assertTrue(alice.check_password('secret123'))
+        self.assertEqual((alice.phone, alice.is_approved), ('0171', True))
+        self.assertEqual((bob.role, bob.is_approved, bob.has_usable_password()), ('staff', False, False))
+
+    def test_resume(self):
+        self.run_import(start_line=2)
+        # Alice's row was skipped, so the later row with her email is no longer a duplicate.
+        self.assertEqual(set(Account.objects.values_list('username', flat=True)), {'existing', 'bob', 'alice2'})
+
+    @override_settings(ACCOUNT_IMPORT_WORKERS=1)
+    def test_endpoint(self):
+        self.enterContext(mock.patch.object(importers, '_pool', None))
+        started = self.enterContext(mock.patch.object(importers, 'hashing_pool', wraps=importers.hashing_pool))
+        self.addCleanup(lambda: importers._pool and importers._pool.shutdown())
+        admin = Account.objects.create_superuser('admin@example.com', 'admin', None)
+        headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=admin).key}'}
+        upload = io.BytesIO(b'{"email": "n@example.com", "username": "n", "password": "secret123"}\nnot json\n')
+        upload.name = 'accounts.ndjson'
+        response = self.client.post('/api/accounts/import/', {'file': upload}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['skipped'], response.data['last_line']), (1, 1, 2))
+        self.assertTrue(Account.objects.get(username='n').check_password('secret123'))
+
+        # Later imports reuse the same hashing processes.
+        upload = io.BytesIO(b'{"email": "m@example.com", "username": "m", "password": "secret123"}\n')
+        upload.name = 'accounts.ndjson'
+        self.assertEqual(self.client.post('/api/accounts/import/', {'file': upload}, **headers).data['created'], 1)
+        started.assert_called_once_with(1)
+
+
+class GenerateDummyUsersTests(TestCase):
+    fields = ('username', 'email', 'role', 'is_approved', 'nickname', 'phone', 'address_street', 'address_house', 'address_district')
+
+    def generate(self, **options):
+        call_command('generate_dummy_users', count=20, stdout=io.StringIO(), **options)
+        return list(Account.objects.order_by('username').values_list(*self.fields))
+
+    def test_same_seed_same_accounts(self):
+        first = self.generate(seed=7)
+        self.assertEqual(len(first), 20)
+        Account.objects.all().delete()
+        self.assertEqual(self.generate(seed=7), first)
+        Account.objects.all().delete()
+        self.assertNotEqual(self.generate(seed=8), first)
+
+    def test_refreshes_the_directory_count(self):
+        cache.clear()
+        admin = Account.objects.create_superuser('admin@example.com', 'admin', None)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=admin).key}'
+        self.assertEqual(self.client.get('/api/accounts/list/').json()['total_users'], 0)
+        self.generate()
+        self.assertEqual(self.client.get('/api/accounts/list/').json()['total_users'], 20)
@@ -1,11 +1,15 @@
 # accounts/urls.py
 from django.urls import path
-from .views import RegisterView, LoginView, UserListView, UserProfileView, UserProfileEditHistoryView
+from .views import RegisterView, LoginView, UserListView, UserProfileView, UserProfileEditHistoryView, BulkProfileUpdateView, AccountImportView
+from . import async_views
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('login/async/', async_views.login, name='async-login'),
     path('list/', UserListView.as_view(), name='user-list'),
     path('profile/', UserProfileView.as_view(), name='user-profile'),
     path('history/', UserProfileEditHistoryView.as_view(), name='user-profile-history'),
+    path('profiles/bulk/', BulkProfileUpdateView.as_view(), name='user-profile-bulk-update'),
+    path('import/', AccountImportView.as_view(), name='account-import'),
 ]
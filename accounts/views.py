@@ -3,11 +3,21 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import AccountSerializer, LoginSerializer, UserProfileSerializer, UserProfileEditHistorySerializer
+from .serializers import AccountListSerializer, AccountSerializer, LoginSerializer, UserProfileSerializer, UserProfileEditHistorySerializer
 from .models import Account, UserProfileEditHistory
-from django.contrib.auth.hashers import check_password
-from rest_framework.permissions import IsAuthenticated
+from . import hashing
+from .bulk import ProfileUpdateBatch, apply_profile_changes, history_rows
+from .importers import FORMATS, AccountImporter, read_rows, shared_hashing_pool
+from .cache import cached_count
+from .filters import filter_accounts
+from .pagination import AccountCursorPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
+from django.db import transaction
+from inventory.parsers import NDJSONParser
+from inventract_backend.middleware import serialized
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from rest_framework.authtoken.models import Token
 
 class RegisterView(APIView):
     permission_classes = []  # <-- No authentication required
@@ -27,18 +37,21 @@ class LoginView(APIView):
             email = serializer.validated_data['email']
             password = serializer.validated_data['password']
 
+            account = Account.objects.filter(email=email).first()
             try:
-                account = Account.objects.get(email=email)
-            except Account.DoesNotExist:
-                return Response({"success": False, "error": "Invalid email or password."}, status=401)
-
-            if not check_password(password, account.password):
+                # Unknown emails are hashed too, so they take as long as wrong passwords.
+                is_correct = hashing.check_password(account, password)
+            except hashing.HashingPoolFull:
+                return Response({"success": False, "error": "Too many logins in progress, try again shortly."},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+            if not is_correct:
                 return Response({"success": False, "error": "Invalid email or password."}, status=401)
 
             if account.role == 'staff' and not account.is_approved:
                 return Response({"success": False, "error": "Staff not approved by admin."}, status=403)
 
             # ✅ Successful login
+            token, _ = Token.objects.get_or_create(user=account)
             user_data = {
                 "id": account.id,  # Include user id here
                 "email": account.email,
@@ -46,6 +59,7 @@ class LoginView(APIView):
                 "role": account.role
             }
             return Response({
+                "token": token.key,
                 "user": user_data
             }, status=status.HTTP_200_OK)
 
@@ -82,32 +96,82 @@ class UserProfileEditHistoryView(APIView):
             account = Account.objects.get(id=user_id, role='user')
         except Account.DoesNotExist:
             return Response({'error': 'User not found or not a user.'}, status=404)
-        # Compare and update all profile fields
-        changed_fields = []
-        for field in ['phone', 'nickname', 'address_street', 'address_house', 'address_district']:
-            if field in request.data:
-                old_value = getattr(account, field, None)
-                new_value = request.data[field]
-                if old_value != new_value:
-                    setattr(account, field, new_value)
-                    changed_fields.append((field, old_value, new_value))
-        account.save()
-        # Save edit history for each changed field
-        for field, old_value, new_value in changed_fields:
-            UserProfileEditHistory.objects.create(
-                user=account,
-                field_changed=field,
-                old_value=old_value,
-                new_value=new_value
-            )
+        changed_fields = apply_profile_changes(account, request.data)
+        if changed_fields:
+            with transaction.atomic():
+                account.save(update_fields=[field for field, _, _ in changed_fields])
+                UserProfileEditHistory.objects.bulk_create(history_rows(account, changed_fields))
         return Response({'message': 'Profile updated and history saved.', 'changes': changed_fields}, status=status.HTTP_200_OK)
 
+
+class BulkProfileUpdateView(APIView):
+    """
+    Update many users' profiles in one request, as a JSON array (or
+    {"updates": [...]}) or an NDJSON body of {"user_id": ..., <profile fields>}
+    lines. Valid lines are written and every line gets a change report.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser, NDJSONParser]
+    max_lines = 10000
+
+    def post(self, request):
+        lines = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': 'A non-empty list of updates is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(lines) > self.max_lines:
+            return Response({'error': f'At most {self.max_lines} updates per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        batch = ProfileUpdateBatch(lines)
+        results = batch.process()
+        return Response(
+            {'updated': sum(result['status'] == 'updated' for result in results), 'results': results},
+            status=status.HTTP_207_MULTI_STATUS if batch.has_errors else status.HTTP_200_OK,
+        )
+
+class AccountImportView(APIView):
+    """
+    Import accounts from an uploaded CSV or NDJSON ``file`` (see
+    accounts.importers). The format comes from ?format= or the file name.
+    The response's last_line can be passed back as ?start_line= to resume
+    an interrupted import.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A file is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        format = request.query_params.get('format') or ('csv' if upload.name.lower().endswith('.csv') else 'ndjson')
+        if format not in FORMATS:
+            return Response({'error': f"format must be one of {', '.join(FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        start_line = request.query_params.get('start_line', '0')
+        if not start_line.isdigit():
+            return Response({'error': 'start_line must be a non-negative integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = AccountImporter(shared_hashing_pool(), start_line=int(start_line)).run(read_rows(upload, format))
+        return Response({
+            'created': importer.created,
+            'skipped': importer.skipped,
+            'last_line': importer.last_line,
+            'errors': importer.errors,
+        }, status=status.HTTP_200_OK)
+
 class UserListView(APIView):
-    permission_classes = []
+    """
+    The user directory, a page at a time (see AccountCursorPagination), with
+    optional role and search filters (see filter_accounts). total_users is
+    cached until an account changes. Admins only: it searches emails and phone numbers.
+    """
+    permission_classes = [IsAdminUser]
+
     def get(self, request):
-        users = Account.objects.filter(is_superuser=False)
-        serializer = AccountSerializer(users, many=True)
+        users = filter_accounts(Account.objects.filter(is_superuser=False), request.query_params)
+        paginator = AccountCursorPagination()
+        page = paginator.paginate_queryset(users.only(*AccountListSerializer.Meta.fields), request, view=self)
         return Response({
-            "total_users": users.count(),
-            "users": serializer.data
+            "total_users": cached_count(users, request.query_params),
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "users": serialized(AccountListSerializer(page, many=True))
         }, status=status.HTTP_200_OK)
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db import connection
 
-from .models import Product, StockEntry, StockExit, StockAdjustment, StockManagement
+from .models import Product, StockEntry, StockExit, StockAdjustment, StockManagement, StockBalance, StockSnapshot
+from .search import prefix_query, words
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -14,34 +16,42 @@ class ProductAdmin(admin.ModelAdmin):
         'category',  
     ]
     list_filter = ['category',]
-    search_fields = ['name', 'sku', 'category__name']
+    search_fields = ['name', 'sku', 'category']
     ordering = ['name']
 
+    def get_search_results(self, request, queryset, search_term):
+        # On PostgreSQL, match the indexed search vector instead of scanning with icontains.
+        if connection.vendor == 'postgresql' and words(search_term):
+            return queryset.filter(search_vector=prefix_query(words(search_term))), False
+        return super().get_search_results(request, queryset, search_term)
+
 @admin.register(StockEntry)
 class StockEntryAdmin(admin.ModelAdmin):
     list_display = [
         'product',
         'quantity',
-        'entry_date',
-        'reason',
+        'transaction_date',
+        'note',
         'performed_by',
     ]
-    list_filter = ['entry_date']
-    search_fields = ['product__name', 'performed_by']
-    ordering = ['-entry_date']
+    fields = ['product', 'quantity', 'note', 'performed_by']
+    list_filter = ['transaction_date']
+    search_fields = ['product__name', 'performed_by__username']
+    ordering = ['-transaction_date']
 
 @admin.register(StockExit)
 class StockExitAdmin(admin.ModelAdmin):
     list_display = [
         'product',
         'quantity',
-        'exit_date',
-        'reason',
+        'transaction_date',
+        'note',
         'performed_by',
     ]
-    list_filter = ['exit_date']
-    search_fields = ['product__name', 'performed_by']
-    ordering = ['-exit_date']
+    fields = ['product', 'quantity', 'note', 'performed_by']
+    list_filter = ['transaction_date']
+    search_fields = ['product__name', 'performed_by__username']
+    ordering = ['-transaction_date']
 
 @admin.register(StockAdjustment)
 class StockAdjustmentAdmin(admin.ModelAdmin):
@@ -77,3 +87,24 @@ class StockManagementAdmin(admin.ModelAdmin):
     search_fields = ['product__name', 'coupon_code', 'performed_by__username']
     ordering = ['-transaction_date']
 
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = [
+        'product',
+        'quantity',
+        'updated_at',
+    ]
+    search_fields = ['product__name', 'product__sku']
+    readonly_fields = ['product', 'quantity', 'updated_at']
+    ordering = ['product__name']
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = [
+        'product',
+        'quantity',
+        'taken_at',
+    ]
+    list_filter = ['taken_at']
+    search_fields = ['product__name', 'product__sku']
+    ordering = ['-taken_at']
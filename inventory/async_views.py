@@ -0,0 +1,159 @@
+"""
+Async variants of the read-heavy catalog and stock endpoints, for ASGI
+deployments. They return the same data as their DRF counterparts in views.py
+but query through the async ORM, so a worker is not blocked on database round
+trips. DRF views are sync-only, so authentication, permissions and error
+responses are handled by ``async_api_view`` instead.
+"""
+import csv
+import functools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated, NotFound, PermissionDenied
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from accounts.authentication import aauthenticate
+from inventract_backend.middleware import serialized
+from .cache import CATALOG_VERSION_KEY, acached_response, product_version_key
+from .filters import filter_products
+from .models import Product
+from .movements import FIELDS, EchoBuffer, decode_cursor, encode_cursor, log_entry, movement_log, parse_bound
+from .pagination import apaginate_products
+from .serializers import ProductSerializer
+from .views import GroupedProductFeedView, StockMovementLogView
+
+ANYONE, AUTHENTICATED, STAFF = 'anyone', 'authenticated', 'staff'
+
+
+def async_api_view(permission):
+    """
+    Allow GET and HEAD only, authenticate the request by token, enforce
+    ``permission`` (ANYONE, AUTHENTICATED or STAFF, matching the DRF views) and
+    turn DRF API exceptions into the JSON error responses DRF would send.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in ('GET', 'HEAD'):
+                    raise MethodNotAllowed(request.method)
+                request.user = await aauthenticate(request)
+                if permission != ANYONE and request.user is None:
+                    raise NotAuthenticated()
+                if permission == STAFF and request.user.role != 'staff':
+                    raise PermissionDenied()
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+                return JsonResponse(detail, status=exc.status_code, safe=False)
+        return wrapper
+    return decorator
+
+
+def _error(message, status_code):
+    return JsonResponse({'error': message}, status=status_code)
+
+
+@async_api_view(ANYONE)
+async def product_list(request):
+    async def build():
+        fields = ProductSerializer.requested_fields(request.GET)
+        products = filter_products(Product.objects.all(), request.GET)
+        if fields:
+            products = products.only(*ProductSerializer.model_fields(fields))
+        page, next_url = await apaginate_products(products, request)
+        return {'next': next_url, 'previous': None, 'results': serialized(ProductSerializer(page, many=True, fields=fields))}
+    return await acached_response(request, CATALOG_VERSION_KEY, build)
+
+
+@async_api_view(AUTHENTICATED)
+async def product_detail(request, pk):
+    async def build():
+        product = await Product.objects.filter(pk=pk).afirst()
+        if product is None:
+            raise NotFound()
+        return serialized(ProductSerializer(product))
+    return await acached_response(request, product_version_key(pk), build)
+
+
+@async_api_view(AUTHENTICATED)
+async def grouped_product_feed(request):
+    async def build():
+        products = [product async for product in GroupedProductFeedView.ranked_products(request.GET)]
+        return GroupedProductFeedView.group(serialized(ProductSerializer(products, many=True)))
+    return await acached_response(request, CATALOG_VERSION_KEY, build)
+
+
+@async_api_view(STAFF)
+async def product_list_with_stock(request):
+    products = Product.objects.with_stock().values('id', 'name', 'sku', 'stock', 'price', 'category')
+    page, next_url = await apaginate_products(products, request)
+    results = [
+        {
+            'id': product['id'],
+            'name': product['name'],
+            'sku': product['sku'],
+            'current_stock': product['stock'],
+            'price': str(product['price']),
+            'category': product['category'],
+        }
+        for product in page
+    ]
+    return JsonResponse({'next': next_url, 'previous': None, 'results': results}, encoder=JSONEncoder)
+
+
+@async_api_view(STAFF)
+async def stock_movement_log(request, product_id):
+    product = await Product.objects.only('id', 'name').filter(id=product_id).afirst()
+    if product is None:
+        return _error('Product not found.', status.HTTP_404_NOT_FOUND)
+    bounds = {}
+    for name in ('since', 'until'):
+        value = request.GET.get(name)
+        if value:
+            bounds[name] = parse_bound(value, upper=name == 'until')
+            if bounds[name] is None:
+                return _error(f'{name} must be an ISO date or datetime.', status.HTTP_400_BAD_REQUEST)
+
+    export = request.GET.get('export')
+    if export in ('ndjson', 'csv'):
+        return _stream_log(product, movement_log(product.id, **bounds), export)
+
+    cursor = None
+    if request.GET.get('cursor'):
+        cursor = decode_cursor(request.GET['cursor'])
+        if cursor is None:
+            return _error('Invalid cursor.', status.HTTP_400_BAD_REQUEST)
+    page_size = request.GET.get('page_size', '')
+    max_page_size = StockMovementLogView.max_page_size
+    page_size = min(int(page_size), max_page_size) if page_size.isdigit() and int(page_size) > 0 else StockMovementLogView.page_size
+
+    rows = [row async for row in movement_log(product.id, cursor=cursor, **bounds)[:page_size + 1]]
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(rows[-1]))
+    log = [log_entry(row) for row in rows]
+    return JsonResponse({'product': product.name, 'log': log, 'next': next_url}, encoder=JSONEncoder)
+
+
+def _stream_log(product, rows, export):
+    async def lines():
+        writer = csv.writer(EchoBuffer())
+        if export == 'csv':
+            yield writer.writerow(FIELDS)
+        async for row in rows.aiterator(chunk_size=2000):
+            entry = log_entry(row)
+            if export == 'ndjson':
+                yield json.dumps(entry, cls=DjangoJSONEncoder) + '\n'
+            else:
+                yield writer.writerow([entry.get(field, '') for field in FIELDS])
+
+    content_type = 'application/x-ndjson' if export == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(lines(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="stock-log-{product.id}.{export}"'
+    return response
@@ -0,0 +1,120 @@
+"""
+Batch ingestion of stock-in / stock-out lines.
+
+All lines are validated against the affected products and their stock
+balances, loaded in a few queries with the balance rows locked until commit. Stock is then simulated in memory in
+line order, so a later stock-out can rely on an earlier stock-in in the same
+batch. Accepted lines are written to the ledger with one bulk_create.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .cache import bump_catalog_version
+from .models import Product, StockBalance, StockManagement
+
+MOVEMENT_TYPES = ('in', 'out')
+
+
+def _positive_int(value):
+    # int() would truncate 2.9 to 2; only whole numbers are accepted.
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class StockMovementBatch:
+    def __init__(self, lines):
+        self.lines = lines
+        self.results = []
+        self.accepted = []
+
+    @property
+    def has_errors(self):
+        return len(self.accepted) != len(self.lines)
+
+    def validate(self):
+        product_ids, user_ids = set(), set()
+        for line in self.lines:
+            if isinstance(line, dict):
+                if _positive_int(line.get('product_id')):
+                    product_ids.add(int(line['product_id']))
+                if _positive_int(line.get('performed_by')):
+                    user_ids.add(int(line['performed_by']))
+        products = Product.objects.select_related('coupon').in_bulk(product_ids)
+        users = set(get_user_model().objects.filter(id__in=user_ids).values_list('id', flat=True))
+        stock = self.lock_balances(list(products))
+
+        for number, line in enumerate(self.lines, start=1):
+            error = None
+            if not isinstance(line, dict):
+                error = 'Each line must be an object.'
+            elif line.get('type') not in MOVEMENT_TYPES:
+                error = "type must be 'in' or 'out'."
+            elif not _positive_int(line.get('quantity')):
+                error = 'quantity must be a positive integer.'
+            elif _positive_int(line.get('product_id')) not in products:
+                error = 'Product not found.'
+            elif line.get('performed_by') not in (None, '') and _positive_int(line['performed_by']) not in users:
+                error = 'performed_by user not found.'
+            if error:
+                self.results.append({'line': number, 'status': 'error', 'error': error})
+                continue
+
+            product = products[int(line['product_id'])]
+            quantity = int(line['quantity'])
+            delta = quantity if line['type'] == 'in' else -quantity
+            if stock[product.id] + delta < 0:
+                self.results.append({'line': number, 'status': 'error', 'error': 'Not enough stock to complete this operation.'})
+                continue
+            stock[product.id] += delta
+            self.accepted.append((number, line, product, quantity, delta))
+            self.results.append({'line': number, 'status': 'ok'})
+        return self
+
+    @staticmethod
+    def lock_balances(product_ids):
+        """Lock the balance rows of every product in the batch, in id order to avoid deadlocks."""
+        existing = set(StockBalance.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+        for product_id in set(product_ids) - existing:
+            StockBalance.ensure(product_id)
+        balances = StockBalance.objects.select_for_update().filter(product_id__in=product_ids).order_by('product_id')
+        return dict(balances.values_list('product_id', 'quantity'))
+
+    @transaction.atomic
+    def process(self, all_or_nothing=False):
+        """
+        Validate and write the batch in one transaction, holding the balance
+        locks throughout. With ``all_or_nothing`` nothing is written if any
+        line fails. Returns the per-line results.
+        """
+        self.validate()
+        if self.has_errors and all_or_nothing:
+            self.accepted = []
+            return self.results
+        return self.write()
+
+    def write(self):
+        """Write every accepted line; call within the transaction that validated them."""
+        ledger, deltas = [], {}
+        for number, line, product, quantity, delta in self.accepted:
+            entry = StockManagement(
+                product=product, transaction_type=line['type'], quantity=delta,
+                note=str(line.get('reason') or ''), performed_by_id=_positive_int(line.get('performed_by')),
+            )
+            entry.set_pricing()
+            ledger.append(entry)
+            deltas[product.id] = deltas.get(product.id, 0) + delta
+
+        StockManagement.objects.bulk_create(ledger)
+        for product_id, delta in deltas.items():
+            StockBalance.apply(product_id, delta)
+        transaction.on_commit(lambda: bump_catalog_version(deltas))
+
+        results = {result['line']: result for result in self.results}
+        for (number, *_), entry in zip(self.accepted, ledger):
+            results[number]['id'] = entry.pk
+        return self.results
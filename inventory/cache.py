@@ -0,0 +1,98 @@
+"""
+Catalog versioning and response caching.
+
+Every product, coupon and stock write bumps a version stamp (a nanosecond
+timestamp) for the catalog and for each affected product. Cached responses
+are keyed by that stamp, so a write invalidates them without a cache scan.
+The same stamp drives the ETag and Last-Modified headers. If a stamp gets
+evicted, the next read mints a new one, which only costs one cache miss.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+CATALOG_VERSION_KEY = 'inventory:catalog:version'
+PRODUCT_VERSION_KEY = 'inventory:product:{}:version'
+RESPONSE_KEY = 'inventory:response:{}'
+
+
+def product_version_key(product_id):
+    return PRODUCT_VERSION_KEY.format(product_id)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+def bump_catalog_version(product_ids=()):
+    """Invalidate catalog-wide responses and those of the given products."""
+    now = time.time_ns()
+    versions = {CATALOG_VERSION_KEY: now}
+    versions.update({product_version_key(product_id): now for product_id in product_ids})
+    cache.set_many(versions, None)
+
+
+async def aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key) or time.time_ns()
+    return version
+
+
+def _validators(request, version):
+    """Return (digest, etag, last_modified) for the request at the given version."""
+    # Cached bodies hold absolute URLs (e.g. next), so the host is part of the key.
+    digest = hashlib.md5(f'{version}:{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+    return digest, quote_etag(digest), version // 1_000_000_000
+
+
+def _with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_response(request, version_key, build):
+    """
+    Serve ``build()`` (returning response data) through the response cache,
+    answering 304 Not Modified when the client's ETag or date is current.
+    """
+    digest, etag, last_modified = _validators(request, get_version(version_key))
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    key = RESPONSE_KEY.format(digest)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    return _with_validators(Response(data, status=status.HTTP_200_OK), etag, last_modified)
+
+
+async def acached_response(request, version_key, build):
+    """cached_response() for async views: ``build`` is a coroutine function and the result a JsonResponse."""
+    digest, etag, last_modified = _validators(request, await aget_version(version_key))
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    key = RESPONSE_KEY.format(digest)
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    return _with_validators(JsonResponse(data, encoder=JSONEncoder), etag, last_modified)
@@ -0,0 +1,59 @@
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+
+def _decimal_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    # Decimal() also parses NaN and Infinity, which no price column can be compared with.
+    if number is None or not number.is_finite():
+        raise ValidationError({name: 'A valid number is required.'})
+    return number
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'A valid integer is required.'})
+
+
+def filter_products(queryset, params):
+    """
+    Apply the product list query filters:
+    category (comma-separated), min_price, max_price, low_stock (stock at or
+    below the given threshold), coupon (active coupon code) and has_coupon.
+    """
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(category__in=category.split(','))
+
+    min_price = _decimal_param(params, 'min_price')
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    max_price = _decimal_param(params, 'max_price')
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    low_stock = _int_param(params, 'low_stock')
+    if low_stock is not None:
+        queryset = queryset.with_stock().filter(stock__lte=low_stock)
+
+    coupon = params.get('coupon')
+    if coupon:
+        queryset = queryset.filter(coupon__code=coupon, coupon__active=True)
+    has_coupon = params.get('has_coupon')
+    if has_coupon in ('true', '1'):
+        queryset = queryset.filter(coupon__active=True)
+    elif has_coupon in ('false', '0'):
+        queryset = queryset.exclude(coupon__active=True)
+    return queryset
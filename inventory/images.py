@@ -0,0 +1,139 @@
+"""
+Product image renditions.
+
+Every product image gets fixed-size renditions (RENDITIONS), each saved as WebP
+and as a JPEG fallback. They are generated off the request path: once a
+product's image changes and the transaction commits, the work goes to a small
+thread pool (Pillow releases the GIL while decoding, resizing and encoding).
+The resulting storage names are kept in Product.image_renditions next to the
+image they were made from, so stale renditions are easy to spot.
+
+Renditions are named after the SHA-256 of the image's content, like the
+content-addressed images themselves (inventory.storage): every product using
+the same image shares one set, rendered once. They are deleted together with
+the image's MediaBlob, by release_media() or gc_media, not with any product;
+images stored before MediaBlob existed keep theirs, as they keep the image.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cache import bump_catalog_version
+from .models import Product
+from .storage import content_digest
+
+logger = logging.getLogger(__name__)
+
+# Name -> (width, height, crop). Cropped renditions fill the box exactly; the
+# others keep the aspect ratio and fit inside it.
+RENDITIONS = {
+    'thumbnail': (200, 200, True),
+    'medium': (800, 800, False),
+}
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+RENDITIONS_DIR = 'product_images/renditions'
+
+_pool = None
+_lock = threading.Lock()
+
+
+def rendition_paths(digest):
+    """{rendition: {format: storage name}} for the image with this SHA-256."""
+    return {
+        name: {extension: f'{RENDITIONS_DIR}/{digest[:2]}/{digest}-{name}.{extension}' for extension in FORMATS}
+        for name in RENDITIONS
+    }
+
+
+def render(image_name, force=False):
+    """
+    Create the renditions of a stored image that do not exist yet (all of them
+    with ``force``); return {rendition: {format: storage name}}.
+    """
+    with default_storage.open(image_name) as source:
+        renditions = rendition_paths(content_digest(source))
+        if not force and all(default_storage.exists(path) for path in rendition_names(renditions)):
+            return renditions  # Already made for another product using the same image.
+        image = Image.open(source)
+        # JPEG decoders can scale down while decoding, which is much faster than a full decode.
+        largest = max(max(width, height) for width, height, _ in RENDITIONS.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    for name, (width, height, crop) in RENDITIONS.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = ImageOps.contain(image, (width, height), Image.Resampling.LANCZOS)
+        for extension, (format, options) in FORMATS.items():
+            path = renditions[name][extension]
+            if force:
+                default_storage.delete(path)
+            elif default_storage.exists(path):
+                continue
+            frame = resized
+            if format == 'JPEG' and frame.mode == 'RGBA':
+                frame = Image.alpha_composite(Image.new('RGBA', frame.size, 'white'), frame).convert('RGB')
+            buffer = io.BytesIO()
+            frame.save(buffer, format, **options)
+            saved = default_storage.save(path, ContentFile(buffer.getvalue()))
+            if saved != path:
+                # A job for another product using the image stored it first; keep that copy.
+                default_storage.delete(saved)
+    return renditions
+
+
+def rendition_names(renditions):
+    return [name for formats in (renditions or {}).values() if isinstance(formats, dict) for name in formats.values()]
+
+
+def generate_renditions(product_id, force=False):
+    """
+    Bring a product's renditions up to date with its image (or remake them
+    with ``force``). Safe to run concurrently with edits: renditions are only
+    recorded if the image is still the one they were made from.
+    """
+    product = Product.objects.filter(pk=product_id).only('image', 'image_renditions').first()
+    if product is None:
+        return
+    image_name = product.image.name or ''
+    if product.image_renditions.get('source') == image_name and not force:
+        return
+    renditions = {'source': image_name}
+    if image_name:
+        renditions.update(render(image_name, force=force))
+    # If the image changed while rendering, its own job records new renditions. These
+    # ones, like those of a replaced image, are shared and go with the image's blob.
+    if Product.objects.filter(pk=product_id, image=image_name).update(image_renditions=renditions):
+        # update() sends no post_save, so refresh cached product responses here.
+        bump_catalog_version([product_id])
+
+
+def _run(product_id):
+    try:
+        generate_renditions(product_id)
+    except Exception:
+        logger.exception('Could not generate renditions for product %s', product_id)
+    finally:
+        # Pool threads outlive requests, so nothing else would close their connections.
+        connection.close()
+
+
+def schedule_renditions(product_id):
+    """Generate a product's renditions in the background once the current transaction commits."""
+    def submit():
+        global _pool
+        with _lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(settings.IMAGE_RENDITION_WORKERS, thread_name_prefix='image-renditions')
+        _pool.submit(_run, product_id)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,295 @@
+import io
+import json
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.authtoken.models import Token
+from accounts.cache import bump_directory_version
+from inventory.cache import bump_catalog_version
+from inventory.models import Product, StockManagement
+from inventory.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every endpoint in inventory/urls.py and accounts/urls.py in-process: query count, '
+        'p50/p99 latency and peak memory, failing when a budget is exceeded. Runs against the configured '
+        'database (DB_ENGINE=sqlite for a local file) and writes to it, so point it at a scratch database.'
+    )
+
+    # Endpoint name -> (max queries, p99 latency in ms). Query budgets must not grow with the dataset;
+    # latency budgets are for the default seed size and scale with --latency-scale.
+    budgets = {
+        'product-list': (2, 150),
+        'product-create': (5, 150),
+        'product-detail': (2, 100),
+        'product-update': (7, 150),
+        'product-delete': (12, 150),
+        'product-modification-list': (2, 500),
+        'product-grouped-feed': (2, 300),
+        'product-search': (2, 150),
+        'stock-entry-create': (6, 100),
+        'stock-exit-create': (6, 100),
+        'stock-bulk-create': (12, 300),
+        'stock-movement-log': (3, 150),
+        'product-list-with-stock': (2, 150),
+        'stock-as-of-list': (2, 300),
+        'stock-as-of': (2, 150),
+        'inventory-valuation': (2, 500),
+        'async-product-list': (2, 150),
+        'async-product-detail': (2, 100),
+        'async-product-grouped-feed': (2, 300),
+        'async-product-list-with-stock': (2, 150),
+        'async-stock-movement-log': (3, 150),
+        # Register, login and import are dominated by password hashing, not the database.
+        'register': (4, 1500),
+        'login': (2, 1500),
+        'async-login': (2, 1500),
+        'account-import': (6, 1500),
+        'user-list': (3, 1000),
+        'user-profile': (1, 50),
+        'user-profile-history': (6, 100),
+        'user-profile-bulk-update': (6, 300),
+    }
+    # Every named route in these URLconfs needs at least one endpoint below.
+    urlconfs = ('inventory.urls', 'accounts.urls')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='Seed products, users and stock movements first')
+        parser.add_argument('--products', type=int, default=1000, help='Products to seed')
+        parser.add_argument('--movements', type=int, default=20, help='Stock movements to seed per product')
+        parser.add_argument('--users', type=int, default=200, help='Accounts to seed')
+        parser.add_argument('--runs', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiply every latency budget')
+        parser.add_argument('--max-memory-mb', type=float, default=64, help='Peak traced memory budget per request')
+        parser.add_argument('--warm-cache', action='store_true', help='Keep cached responses between requests')
+        parser.add_argument('--only', help='Only run endpoints whose name contains this text')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        # Expected 4xx responses (e.g. the profile endpoint) and per-request metrics would otherwise be logged.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        logging.getLogger('inventract_backend.middleware').setLevel(logging.ERROR)
+        if options['seed']:
+            self.seed(options['products'], options['movements'], options['users'])
+        if not StockManagement.objects.exists():
+            raise CommandError('No stock movements found; run with --seed first.')
+
+        ctx = self.context()
+        endpoints = self.endpoints(ctx)
+        self.check_coverage(endpoints)
+        failures = []
+        row = '{:<30} {:>6} {:>8} {:>9} {:>9} {:>10}  {}'
+        self.stdout.write(f"Database: {connection.vendor}, {Product.objects.count()} products, "
+                          f"{StockManagement.objects.count()} ledger rows")
+        self.stdout.write(row.format('Endpoint', 'Status', 'Queries', 'p50 ms', 'p99 ms', 'Peak KB', ''))
+        for name, route, method, prepare in endpoints:
+            if options['only'] and options['only'] not in name:
+                continue
+            max_queries, p99_budget = self.budgets[name]
+            p99_budget *= options['latency_scale']
+            statuses, queries, timings = set(), 0, []
+            # Untimed, so one-off per-process work (e.g. building the search index) isn't counted.
+            self.send(ctx, method, prepare())
+            for _ in range(options['runs']):
+                request = prepare()
+                if not options['warm_cache']:
+                    self.expire_responses(ctx)
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = self.send(ctx, method, request)
+                    timings.append((time.perf_counter() - started) * 1000)
+                statuses.add(response.status_code)
+                queries = max(queries, len(captured))
+
+            if not options['warm_cache']:
+                self.expire_responses(ctx)
+            request = prepare()
+            tracemalloc.start()
+            self.send(ctx, method, request)
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+            p50 = statistics.median(timings)
+            p99 = statistics.quantiles(timings, n=100)[98] if len(timings) > 1 else timings[0]
+            problems = []
+            if any(code >= 500 for code in statuses):
+                problems.append('server error')
+            if queries > max_queries:
+                problems.append(f'queries > {max_queries}')
+            if p99 > p99_budget:
+                problems.append(f'p99 > {p99_budget:.0f} ms')
+            if peak_kb > options['max_memory_mb'] * 1024:
+                problems.append(f"memory > {options['max_memory_mb']} MB")
+            if problems:
+                failures.append(f"{name}: {', '.join(problems)}")
+            self.stdout.write(row.format(
+                name, ','.join(map(str, sorted(statuses))), queries, f'{p50:.1f}', f'{p99:.1f}', f'{peak_kb:.0f}',
+                self.style.ERROR('; '.join(problems)) if problems else self.style.SUCCESS('ok'),
+            ))
+
+        if failures:
+            raise CommandError('Budgets exceeded:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget.'))
+
+    def check_coverage(self, endpoints):
+        """Fail before benchmarking when a named route has no endpoint or an endpoint has no budget."""
+        def route_names(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from route_names(pattern.url_patterns)
+                elif pattern.name:
+                    yield pattern.name
+
+        routes = {name for urlconf in self.urlconfs for name in route_names(get_resolver(urlconf).url_patterns)}
+        problems = [f'route {name} has no endpoint' for name in sorted(routes - {route for _, route, _, _ in endpoints})]
+        problems += [f'endpoint {name} has no budget' for name, *_ in endpoints if name not in self.budgets]
+        if problems:
+            raise CommandError('Incomplete benchmark:\n' + '\n'.join(problems))
+
+    def seed(self, products, movements, users):
+        User = get_user_model()
+        if not User.objects.filter(is_superuser=True).exists():
+            User.objects.create_superuser('bench-admin@example.com', 'bench-admin', 'test12345')
+        categories = [value for value, _ in Product.CATEGORY_CHOICES]
+        existing = Product.objects.count()
+        Product.objects.bulk_create([
+            Product(
+                name=f'Benchmark product {i}', sku=f'BENCH-{i:07d}', quantity=0,
+                price=Decimal(random.randint(100, 100000)) / 100, category=random.choice(categories),
+            )
+            for i in range(existing, products)
+        ], batch_size=1000)
+        update_search_vectors(Product.objects.all())
+        call_command('generate_dummy_users', count=users, stdout=io.StringIO())
+        call_command('generate_dummy_stock', count=movements, stdout=io.StringIO())
+
+    def context(self):
+        User = get_user_model()
+        staff = User.objects.filter(email='bench-staff@example.com').first() or User.objects.create_user(
+            'bench-staff@example.com', 'bench-staff', 'test12345', role='staff', is_approved=True,
+        )
+        customer = User.objects.filter(email='bench-user@example.com').first() or User.objects.create_user(
+            'bench-user@example.com', 'bench-user', 'test12345', role='user', is_approved=True,
+        )
+        busiest = (
+            StockManagement.objects.values('product_id').annotate(movements=Count('id')).order_by('-movements').first()
+        )
+        return {
+            'client': Client(),
+            'token': Token.objects.get_or_create(user=staff)[0].key,
+            'admin_token': Token.objects.get_or_create(user=User.objects.filter(is_superuser=True).first())[0].key,
+            'product_id': busiest['product_id'],
+            'customer_id': customer.id,
+            'counter': iter(range(10 ** 9)),
+        }
+
+    def expire_responses(self, ctx):
+        # Only the cached responses and counts: clearing the whole cache would also
+        # drop entries the harness doesn't own, e.g. everything in a shared Redis.
+        bump_catalog_version([ctx['product_id']])
+        bump_directory_version()
+
+    def send(self, ctx, method, request):
+        path, data, authenticated = request
+        # authenticated: False, True (as staff) or 'admin'.
+        token = ctx['admin_token'] if authenticated == 'admin' else ctx['token']
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if authenticated else {}
+        call = getattr(ctx['client'], method)
+        if data is None:
+            return call(path, **headers)
+        if isinstance(data, SimpleUploadedFile):
+            return call(path, {'file': data}, **headers)
+        return call(path, json.dumps(data), content_type='application/json', **headers)
+
+    def new_product(self, ctx):
+        n = next(ctx['counter'])
+        return Product.objects.create(
+            name=f'Bench scratch {n}', sku=f'BENCH-SCRATCH-{time.time_ns()}-{n}', quantity=0, price=Decimal('9.99'),
+        )
+
+    def endpoints(self, ctx):
+        """
+        (name, url name, client method, prepare) where prepare() returns
+        (path, json data, an upload or None, authenticated).
+        """
+        product = f"/api/inventory/{ctx['product_id']}/"
+        async_product = f"/api/inventory/async/{ctx['product_id']}/"
+        stock_line = lambda: {'product_id': ctx['product_id'], 'quantity': 1, 'reason': 'benchmark'}
+
+        def unique_account():
+            n = f"{time.time_ns()}{next(ctx['counter'])}"
+            return {
+                'email': f'bench{n}@example.com', 'username': f'bench{n}',
+                'password': 'test12345', 'confirm_password': 'test12345',
+            }
+
+        def account_upload(rows=2):
+            lines = []
+            for _ in range(rows):
+                n = f"{time.time_ns()}{next(ctx['counter'])}"
+                lines.append(json.dumps({'email': f'import{n}@example.com', 'username': f'import{n}', 'password': 'test12345'}))
+            return SimpleUploadedFile('accounts.ndjson', '\n'.join(lines).encode())
+
+        return [
+            ('product-list', 'product-list-create', 'get', lambda: ('/api/inventory/?page_size=50', None, False)),
+            ('product-create', 'product-list-create', 'post', lambda: ('/api/inventory/', {
+                'name': 'Bench create', 'sku': f"BENCH-NEW-{time.time_ns()}", 'quantity': 0, 'price': '5.00',
+            }, False)),
+            ('product-detail', 'product-detail', 'get', lambda: (product, None, True)),
+            ('product-update', 'product-detail', 'patch', lambda: (product, {'description': 'benchmark'}, True)),
+            ('product-delete', 'product-detail', 'delete', lambda: (f'/api/inventory/{self.new_product(ctx).id}/', None, True)),
+            ('product-modification-list', 'product-modification-list', 'get', lambda: ('/api/inventory/modifications/', None, True)),
+            ('product-grouped-feed', 'product-grouped-feed', 'get', lambda: ('/api/inventory/grouped/', None, True)),
+            ('product-search', 'product-search', 'get', lambda: ('/api/inventory/search/?q=benchmark+produ', None, False)),
+            ('stock-entry-create', 'stock-entry-create', 'post', lambda: ('/api/inventory/stock-in/', stock_line(), True)),
+            ('stock-exit-create', 'stock-exit-create', 'post', lambda: ('/api/inventory/stock-out/', stock_line(), True)),
+            ('stock-bulk-create', 'stock-bulk-create', 'post', lambda: ('/api/inventory/stock-bulk/', [
+                {'type': 'in', **stock_line()} for _ in range(100)
+            ], True)),
+            ('stock-movement-log', 'stock-movement-log', 'get', lambda: (f"/api/inventory/stock-log/{ctx['product_id']}/", None, True)),
+            ('product-list-with-stock', 'product-list-with-stock', 'get', lambda: ('/api/inventory/with-stock/?page_size=50', None, True)),
+            ('stock-as-of-list', 'stock-as-of-list', 'get', lambda: ('/api/inventory/stock-at/?page_size=50', None, True)),
+            ('stock-as-of', 'stock-as-of', 'get', lambda: (f"/api/inventory/stock-at/{ctx['product_id']}/", None, True)),
+            ('inventory-valuation', 'inventory-valuation', 'get', lambda: ('/api/inventory/valuation/', None, True)),
+            ('async-product-list', 'async-product-list', 'get', lambda: ('/api/inventory/async/?page_size=50', None, False)),
+            ('async-product-detail', 'async-product-detail', 'get', lambda: (async_product, None, True)),
+            ('async-product-grouped-feed', 'async-product-grouped-feed', 'get', lambda: (
+                '/api/inventory/async/grouped/', None, True,
+            )),
+            ('async-product-list-with-stock', 'async-product-list-with-stock', 'get', lambda: (
+                '/api/inventory/async/with-stock/?page_size=50', None, True,
+            )),
+            ('async-stock-movement-log', 'async-stock-movement-log', 'get', lambda: (
+                f"/api/inventory/async/stock-log/{ctx['product_id']}/", None, True,
+            )),
+            ('register', 'register', 'post', lambda: ('/api/accounts/register/', unique_account(), False)),
+            ('login', 'login', 'post', lambda: ('/api/accounts/login/', {
+                'email': 'bench-staff@example.com', 'password': 'test12345',
+            }, False)),
+            ('async-login', 'async-login', 'post', lambda: ('/api/accounts/login/async/', {
+                'email': 'bench-staff@example.com', 'password': 'test12345',
+            }, False)),
+            ('account-import', 'account-import', 'post', lambda: ('/api/accounts/import/', account_upload(), 'admin')),
+            ('user-list', 'user-list', 'get', lambda: ('/api/accounts/list/', None, 'admin')),
+            ('user-profile', 'user-profile', 'get', lambda: ('/api/accounts/profile/', None, False)),
+            ('user-profile-history', 'user-profile-history', 'post', lambda: ('/api/accounts/history/', {
+                'user_id': ctx['customer_id'], 'nickname': f"bench{next(ctx['counter'])}",
+            }, False)),
+            ('user-profile-bulk-update', 'user-profile-bulk-update', 'post', lambda: ('/api/accounts/profiles/bulk/', [
+                {'user_id': ctx['customer_id'], 'nickname': f"bench{next(ctx['counter'])}"} for _ in range(100)
+            ], 'admin')),
+        ]
@@ -0,0 +1,68 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Endpoint -> (sync path served by the WSGI deployment, async path served by the ASGI one).
+ENDPOINTS = {
+    'product list': ('/api/inventory/?page_size=50', '/api/inventory/async/?page_size=50'),
+    'product detail': ('/api/inventory/{product_id}/', '/api/inventory/async/{product_id}/'),
+    'grouped feed': ('/api/inventory/grouped/', '/api/inventory/async/grouped/'),
+    'with stock': ('/api/inventory/with-stock/?page_size=50', '/api/inventory/async/with-stock/?page_size=50'),
+    'stock log': ('/api/inventory/stock-log/{product_id}/', '/api/inventory/async/stock-log/{product_id}/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the read endpoints of a running WSGI deployment (e.g. gunicorn) against their async '
+        'variants on a running ASGI deployment (e.g. uvicorn), with many concurrent clients, and compare '
+        'latency and throughput. Does not touch the local database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000', help='Base URL of the WSGI server')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001', help='Base URL of the ASGI server')
+        parser.add_argument('--token', required=True, help='API token of a staff account')
+        parser.add_argument('--product-id', type=int, required=True, help='Product used by detail and log endpoints')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and server')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        row = '{:<16} {:<6} {:>8} {:>8} {:>8} {:>9} {:>7}'
+        self.stdout.write(f"{options['requests']} requests per endpoint, {options['concurrency']} concurrent clients")
+        self.stdout.write(row.format('Endpoint', 'Server', 'mean ms', 'p50 ms', 'p99 ms', 'req/s', 'errors'))
+        for name, paths in ENDPOINTS.items():
+            for server, base, path in (('WSGI', options['wsgi_url'], paths[0]), ('ASGI', options['asgi_url'], paths[1])):
+                url = base.rstrip('/') + path.format(product_id=options['product_id'])
+                timings, errors, elapsed = self.load(url, options)
+                if not timings:
+                    raise CommandError(f'Every request to {url} failed.')
+                self.stdout.write(row.format(
+                    name, server, f'{statistics.fmean(timings):.1f}', f'{statistics.median(timings):.1f}',
+                    f'{statistics.quantiles(timings, n=100)[98]:.1f}', f'{len(timings) / elapsed:.0f}', errors,
+                ))
+
+    def load(self, url, options):
+        headers = {'Authorization': f"Token {options['token']}"}
+
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=options['timeout']) as response:
+                    response.read()
+            except (urllib.error.URLError, TimeoutError):
+                return None
+            return (time.perf_counter() - started) * 1000
+
+        fetch(None)  # warm up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        timings = [result for result in results if result is not None]
+        return timings, len(results) - len(timings), elapsed
@@ -0,0 +1,127 @@
+import argparse
+import importlib.util
+import io
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.authtoken.models import Token
+from accounts.models import Account
+from inventory.models import Product, StockEntry
+
+# Mode -> environment overrides read by DATABASES in settings.py.
+MODES = {
+    'new connection per request': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'persistent (CONN_MAX_AGE)': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '600'},
+    'psycopg pool': {'DB_POOL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request latency on PostgreSQL with a new connection per request, persistent '
+        'connections and a psycopg connection pool. Each mode runs in a fresh process configured '
+        'through the DB_* environment variables, serving requests through the WSGI handler so '
+        'connections are opened and closed exactly as in production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per endpoint and mode')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent request threads')
+        # Internal: set on the child processes, carrying the fixture ids as JSON.
+        parser.add_argument('--worker', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.run_worker(json.loads(options['worker']), options)
+        if connection.vendor != 'postgresql':
+            raise CommandError('Connection pooling is only supported on PostgreSQL.')
+
+        fixtures = self.fixtures()
+        connection.close()
+        self.stdout.write(f"{options['requests']} requests per endpoint, {options['threads']} thread(s)")
+        row = '{:<30} {:<22} {:>8} {:>8} {:>8} {:>9}'
+        self.stdout.write(row.format('Mode', 'Endpoint', 'mean ms', 'p50 ms', 'p99 ms', 'req/s'))
+        for mode, overrides in MODES.items():
+            if overrides.get('DB_POOL') == 'True' and not importlib.util.find_spec('psycopg_pool'):
+                self.stdout.write(self.style.WARNING(f'{mode}: skipped, install "psycopg[pool]"'))
+                continue
+            command = [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_connections',
+                '--worker', json.dumps(fixtures), '--requests', str(options['requests']), '--threads', str(options['threads']),
+            ]
+            result = subprocess.run(command, env={**os.environ, **overrides}, capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(f'{mode} failed:\n{result.stderr}')
+            for endpoint, stats in json.loads(result.stdout.strip().splitlines()[-1]).items():
+                self.stdout.write(row.format(
+                    mode, endpoint, f"{stats['mean']:.2f}", f"{stats['p50']:.2f}", f"{stats['p99']:.2f}",
+                    f"{stats['throughput']:.0f}",
+                ))
+
+    def fixtures(self):
+        staff, _ = Account.objects.get_or_create(
+            email='bench-connections@example.com',
+            defaults={'username': 'bench-connections', 'role': 'staff', 'is_approved': True},
+        )
+        product, created = Product.objects.get_or_create(
+            sku='BENCH-CONNECTIONS', defaults={'name': 'Connection benchmark', 'quantity': 0, 'price': 1},
+        )
+        if created:
+            StockEntry.objects.create(product=product, quantity=1)
+        return {'token': Token.objects.get_or_create(user=staff)[0].key, 'product_id': product.id}
+
+    def run_worker(self, fixtures, options):
+        logging.getLogger('inventract_backend.middleware').setLevel(logging.ERROR)
+        handler = WSGIHandler()
+        product_id = fixtures['product_id']
+        endpoints = {
+            'GET stock-log/': ('GET', f'/api/inventory/stock-log/{product_id}/?page_size=10', b''),
+            'POST stock-in/': ('POST', '/api/inventory/stock-in/', json.dumps(
+                {'product_id': product_id, 'quantity': 1},
+            ).encode()),
+        }
+
+        def call(method, path, body):
+            path, _, query = path.partition('?')
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query,
+                'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+                'HTTP_AUTHORIZATION': f"Token {fixtures['token']}", 'wsgi.input': io.BytesIO(body),
+            }
+            setup_testing_defaults(environ)
+            statuses = []
+            started = time.perf_counter()
+            response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            b''.join(response)
+            # Closing the response fires request_finished, which is when Django closes or keeps the connection.
+            response.close()
+            elapsed = (time.perf_counter() - started) * 1000
+            if not statuses[0].startswith('2'):
+                raise CommandError(f'{method} {path} returned {statuses[0]}')
+            return elapsed
+
+        results = {}
+        with ThreadPoolExecutor(options['threads']) as pool:
+            for name, request in endpoints.items():
+                call(*request)  # warm up imports and caches outside the measurement
+                started = time.perf_counter()
+                timings = list(pool.map(lambda _: call(*request), range(options['requests'])))
+                elapsed = time.perf_counter() - started
+                results[name] = {
+                    'mean': statistics.fmean(timings),
+                    'p50': statistics.median(timings),
+                    'p99': statistics.quantiles(timings, n=100)[98],
+                    'throughput': len(timings) / elapsed,
+                }
+        self.stdout.write(json.dumps(results))
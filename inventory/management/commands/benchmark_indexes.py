@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from inventory.models import Product, StockAdjustment, StockManagement
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN and time the hot queries behind each inventory index, reporting whether '
+        'the planner uses it. Run against a seeded database (see generate_dummy_stock); '
+        'on near-empty tables the planner rightly prefers sequential scans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='Timed executions per query')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every query plan')
+        parser.add_argument('--strict', action='store_true', help='Fail if any index is not used')
+
+    def plans(self):
+        """(index name, what it serves, queryset) for each index in the plan."""
+        category = Product.objects.values_list('category', flat=True).first() or 'other'
+        ledger_row = StockManagement.objects.order_by('-id').values('product_id', 'performed_by_id').first() or {}
+        product_id = ledger_row.get('product_id', 0)
+        user_id = ledger_row.get('performed_by_id') or 0
+        adjusted_id = StockAdjustment.objects.values_list('product_id', flat=True).first() or 0
+        return [
+            ('product_name_id_idx', 'product list ordered by name',
+             Product.objects.order_by('name', 'id')[:50]),
+            ('product_category_id_idx', 'product list filtered by category',
+             Product.objects.filter(category=category).order_by('id')[:50]),
+            ('product_category_name_idx', 'category listing / grouped feed by name',
+             Product.objects.filter(category=category).order_by('name', 'id')[:50]),
+            ('product_category_price_idx', 'grouped feed by price',
+             Product.objects.filter(category=category).order_by('price', 'id')[:50]),
+            ('ledger_product_date_idx', 'stock log and as-of replay',
+             StockManagement.objects.filter(product_id=product_id).order_by('transaction_date', 'id')[:100]),
+            ('ledger_date_idx', 'ledger admin, newest first',
+             StockManagement.objects.order_by('-transaction_date')[:100]),
+            ('ledger_type_date_idx', 'ledger admin filtered by type',
+             StockManagement.objects.filter(transaction_type='out').order_by('-transaction_date')[:100]),
+            ('ledger_user_date_idx', 'ledger admin filtered by user',
+             StockManagement.objects.filter(performed_by_id=user_id).order_by('-transaction_date')[:100]),
+            ('adjustment_product_date_idx', 'stock log adjustments',
+             StockAdjustment.objects.filter(product_id=adjusted_id).order_by('adjustment_date', 'id')[:100]),
+            ('adjustment_date_idx', 'adjustment admin, newest first',
+             StockAdjustment.objects.order_by('-adjustment_date')[:100]),
+        ]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}")
+        row = '{:<28} {:<6} {:>9} {:>9}  {}'
+        self.stdout.write(row.format('Index', 'Used', 'p50 ms', 'max ms', 'Serves'))
+        unused = []
+        for name, purpose, queryset in self.plans():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            used = name in plan
+            if not used:
+                unused.append(name)
+            self.stdout.write(row.format(
+                name, 'yes' if used else 'no', f"{statistics.median(timings):.2f}", f"{max(timings):.2f}", purpose,
+            ))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+        if unused and options['strict']:
+            raise CommandError(f"Indexes not used by the planner: {', '.join(unused)}")
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.models import MediaBlob, Product
+from inventory.storage import release_media
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the products using each stored product image and delete images no product uses, with their renditions, '
+        'e.g. ones left behind by bulk updates or by uploads whose product was never saved.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report, do not write or delete')
+
+    def handle(self, *args, **options):
+        references = Product.objects.filter(image=OuterRef('name')).order_by().values('image').annotate(count=Count('id')).values('count')
+        blobs = MediaBlob.objects.annotate(references=Coalesce(Subquery(references, output_field=IntegerField()), 0))
+        miscounted = [blob for blob in blobs if blob.ref_count != blob.references]
+        cutoff = timezone.now() - timedelta(seconds=settings.MEDIA_GC_GRACE_SECONDS)
+        orphans = [blob for blob in blobs if not blob.references and blob.stored_at <= cutoff]
+
+        for blob in miscounted:
+            self.stdout.write(f'{blob.name}: stored {blob.ref_count} references, found {blob.references}')
+        if options['dry_run']:
+            freed = sum(blob.size for blob in orphans)
+            self.stdout.write(f'Would delete {len(orphans)} unused images ({freed} bytes).')
+            return
+
+        for blob in miscounted:
+            blob.ref_count = blob.references
+        MediaBlob.objects.bulk_update(miscounted, ['ref_count'], batch_size=1000)
+        # release_media() locks and recounts each blob again, in case it was reused meanwhile.
+        release_media([blob.name for blob in orphans])
+        remaining = set(MediaBlob.objects.filter(name__in=[blob.name for blob in orphans]).values_list('name', flat=True))
+        deleted = [blob for blob in orphans if blob.name not in remaining]
+        self.stdout.write(self.style.SUCCESS(
+            f'Corrected {len(miscounted)} reference counts and deleted {len(deleted)} unused images '
+            f'({sum(blob.size for blob in deleted)} bytes).'
+        ))
@@ -1,42 +1,160 @@
-from django.core.management.base import BaseCommand
-from inventory.models import Product, StockTransaction
-from django.contrib.auth import get_user_model
+import io
 import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
 from faker import Faker
+from inventory.cache import bump_catalog_version
+from inventory.models import Product, StockAdjustment, StockBalance, StockManagement, StockSnapshot
+from inventory.movements import parse_bound
+
+CENT = Decimal('0.01')
+
+# Movement kind -> relative weight. 'adjustment' rows go to StockAdjustment, the rest to the ledger
+# ('in' and 'out' rows are what StockEntry and StockExit show).
+KINDS = {'in': 40, 'out': 35, 'adjust': 10, 'correction': 5, 'adjustment': 10}
+
+
+def latest_movements(product_ids):
+    """Product id -> date of its latest ledger row or adjustment."""
+    latest = {}
+    for model, field in [(StockManagement, 'transaction_date'), (StockAdjustment, 'adjustment_date')]:
+        rows = model.objects.filter(product_id__in=product_ids).order_by().values_list('product_id')
+        for product_id, at in rows.annotate(Max(field)):
+            latest[product_id] = max(at, latest.get(product_id, at))
+    return latest
+
+
+def generate_chunk(product_ids, count, seed, batch_size, user_ids, start, until):
+    """
+    Write ``count`` movements for each product, never taking a running stock
+    below zero, dated in order between ``start`` (or the product's latest
+    movement, if later) and ``until``. Each product draws from its own seeded
+    RNG, so the output is the same however products are split across workers.
+    Returns rows written.
+    """
+    notes = Faker()
+    notes.seed_instance(seed)
+    sentences = [notes.sentence() for _ in range(500)]
+    products = Product.objects.select_related('coupon').in_bulk(product_ids)
+    stock = StockBalance.compute(product_ids)
+    latest = latest_movements(product_ids)
+    kinds, weights = list(KINDS), list(KINDS.values())
+
+    ledger, adjustments, written = [], [], 0
+    for product_id in product_ids:
+        product = products[product_id]
+        rng = random.Random(f'{seed}-{product_id}')
+        on_hand = stock.get(product_id, 0)
+        coupon = product.coupon if product.coupon and product.coupon.active else None
+        # Appended after any existing history, so the running stock stays valid at every date.
+        first = max(start, latest.get(product_id, start))
+        span = max(int((until - first).total_seconds()), 1)
+        offsets = sorted((rng.randrange(span) for _ in range(count)), reverse=True)
+        dates = [until - timedelta(seconds=offset) for offset in offsets]
+        for kind, date in zip(rng.choices(kinds, weights, k=count), dates):
+            if kind == 'in':
+                delta = rng.randint(1, 50)
+            elif kind == 'out':
+                delta = -rng.randint(1, 30)
+            else:
+                delta = rng.choice([-1, 1]) * rng.randint(1, 10)
+            if on_hand + delta < 0:
+                kind, delta = 'in', rng.randint(1, 50)
+            performed_by_id = rng.choice(user_ids)
+            if kind == 'adjustment':
+                adjustments.append(StockAdjustment(
+                    product_id=product_id, before=on_hand, after=on_hand + delta, adjustment_date=date,
+                    reason=rng.choice(sentences)[:255], performed_by_id=performed_by_id,
+                ))
+            else:
+                # bulk_create skips StockManagement.save(), so price the row as set_pricing() would.
+                total_value = abs(delta) * product.price
+                discount = (total_value * coupon.discount_percent / 100).quantize(CENT) if coupon else Decimal(0)
+                ledger.append(StockManagement(
+                    product_id=product_id, transaction_type=kind, quantity=delta, transaction_date=date,
+                    note=rng.choice(sentences),
+                    performed_by_id=performed_by_id, price_at_transaction=product.price, total_value=total_value,
+                    coupon_code=coupon.code if coupon else None,
+                    discount_percent=coupon.discount_percent if coupon else None,
+                    discount_amount=discount, final_value=total_value - discount,
+                ))
+            on_hand += delta
+            if len(ledger) + len(adjustments) >= batch_size:
+                written += write(ledger, adjustments)
+    written += write(ledger, adjustments)
+    return written
+
+
+def write(ledger, adjustments):
+    with transaction.atomic():
+        StockManagement.objects.bulk_create(ledger)
+        StockAdjustment.objects.bulk_create(adjustments)
+    written = len(ledger) + len(adjustments)
+    ledger.clear()
+    adjustments.clear()
+    return written
+
 
 class Command(BaseCommand):
-    help = 'Generate dummy stock transactions for products'
+    help = (
+        'Generate dummy stock movements (ledger stock-in/out/adjust/correction rows and stock adjustments) '
+        'for every product with bulk inserts, then rebuild stock balances'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('--count', type=int, default=10, help='Number of transactions per product')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed generates the same rows')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (PostgreSQL only)')
+        parser.add_argument('--days', type=int, default=365, help='Spread the movements over this many days')
+        parser.add_argument('--until', help='ISO date or datetime of the last movements (default: now)')
 
     def handle(self, *args, **options):
-        fake = Faker()
-        User = get_user_model()
-        admin_user = User.objects.filter(is_superuser=True).first()
-        if not admin_user:
-            self.stdout.write(self.style.ERROR("No superuser found. Please create one first."))
-            return
-
-        products = Product.objects.all()
-        transaction_types = ['in', 'out', 'adjust', 'correction']
-        count = options['count']
-
-        for product in products:
-            for _ in range(count):
-                t_type = random.choice(transaction_types)
-                # Stock in: positive, Stock out: negative, adjust/correction: random
-                if t_type == 'in':
-                    qty = random.randint(1, 50)
-                elif t_type == 'out':
-                    qty = -random.randint(1, 30)
-                else:
-                    qty = random.randint(-10, 10)
-                StockTransaction.objects.create(
-                    product=product,
-                    transaction_type=t_type,
-                    quantity=qty,
-                    note=fake.sentence(),
-                    performed_by=admin_user
-                )
-            self.stdout.write(self.style.SUCCESS(f"Generated {count} transactions for {product.name}"))
\ No newline at end of file
+        user_ids = list(
+            get_user_model().objects.filter(Q(is_superuser=True) | Q(role='staff')).values_list('id', flat=True)
+        )
+        if not user_ids:
+            raise CommandError('No superuser or staff account found. Please create one first.')
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        if not product_ids:
+            raise CommandError('No products found.')
+
+        until = timezone.now()
+        if options['until']:
+            until = parse_bound(options['until'])
+            if until is None:
+                raise CommandError('--until must be an ISO date or datetime.')
+        start = until - timedelta(days=options['days'])
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using a single process.'))
+            workers = 1
+        args = (options['count'], options['seed'], options['batch_size'], user_ids, start, until)
+
+        if workers == 1:
+            written = generate_chunk(product_ids, *args)
+        else:
+            # Small chunks keep the workers evenly loaded. Children must not inherit open connections.
+            size = max(1, len(product_ids) // (workers * 8))
+            chunks = [product_ids[i:i + size] for i in range(0, len(product_ids), size)]
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                written = sum(pool.map(generate_chunk, chunks, *([arg] * len(chunks) for arg in args)))
+
+        # Snapshots taken since the start no longer include every movement before them.
+        StockSnapshot.objects.filter(taken_at__gte=start).delete()
+        call_command('rebuild_stock_balances', stdout=io.StringIO())
+        bump_catalog_version(product_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {written} stock movements for {len(product_ids)} products."
+        ))
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.images import generate_renditions
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the thumbnail and medium renditions of product images that do not have current ones, '
+        'e.g. images uploaded before renditions existed. With --all, every product image is redone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate renditions that are already current')
+        parser.add_argument('--workers', type=int, default=4, help='Rendering threads')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.exclude(image='').exclude(image=None).values_list('id', flat=True))
+
+        def generate(product_id):
+            try:
+                generate_renditions(product_id, force=options['all'])
+            except Exception as exc:
+                return f'product {product_id}: {exc}'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(options['workers']) as pool:
+            errors = [error for error in pool.map(generate, product_ids) if error]
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(product_ids)} product images; {len(errors)} could not be rendered.'
+        ))
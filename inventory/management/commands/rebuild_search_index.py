@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.models import Product
+from inventory.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored product search vectors, e.g. after products were written with bulk_create() '
+        'or update(). On databases other than PostgreSQL, marks them for the in-memory indexes to re-read.'
+    )
+
+    def handle(self, *args, **options):
+        updated = update_search_vectors(Product.objects.all())
+        if connection.vendor == 'postgresql':
+            self.stdout.write(self.style.SUCCESS(f'Updated the search vectors of {updated} products.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Search indexes will re-read {updated} products on their next search.'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import Product, StockBalance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify per-product stock balances from the stock ledger and adjustments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report mismatched balances, do not write')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk write')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            # Read-only: no locks, so a check never holds up stock movements.
+            missing, mismatched, stored = self.compare(StockBalance.objects.all(), options['batch_size'])
+            # A product with no movements and no balance row is still consistent.
+            missing = [balance for balance in missing if balance.quantity]
+            if mismatched or missing:
+                raise CommandError(f"{len(mismatched)} mismatched and {len(missing)} missing stock balances.")
+            self.stdout.write(self.style.SUCCESS(f"All {stored} stock balances are consistent."))
+            return
+
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            # Lock the balances before reading the ledger: a movement committing in between would
+            # otherwise be in the stored balance but not in the total written over it.
+            missing, mismatched, _ = self.compare(StockBalance.objects.select_for_update(), batch_size)
+            # A first movement may create a missing row meanwhile; its row is built from the ledger too.
+            StockBalance.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+            StockBalance.objects.bulk_update(mismatched, ['quantity', 'updated_at'], batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(missing)} and corrected {len(mismatched)} stock balances."
+        ))
+
+    def compare(self, balances, batch_size):
+        """Return (missing, mismatched, stored count), reading ``balances`` before the ledger."""
+        stored = {balance.product_id: balance for balance in balances}
+        expected = StockBalance.compute()
+        missing, mismatched = [], []
+        for product_id in Product.objects.values_list('id', flat=True).iterator(chunk_size=batch_size):
+            quantity = expected.get(product_id, 0)
+            balance = stored.get(product_id)
+            if balance is None:
+                missing.append(StockBalance(product_id=product_id, quantity=quantity))
+            elif balance.quantity != quantity:
+                self.stdout.write(f"Product {product_id}: stored {balance.quantity}, expected {quantity}")
+                balance.quantity = quantity
+                balance.updated_at = timezone.now()
+                mismatched.append(balance)
+        return missing, mismatched, len(stored)
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.models import StockSnapshot
+from inventory.movements import parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint every product\'s stock so historical queries only replay later movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help='ISO date or datetime to snapshot (default: now minus --settle-seconds)')
+        parser.add_argument(
+            '--settle-seconds', type=int, default=300,
+            help='How far behind now to snapshot, so movements still being committed are not missed',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        if options['at']:
+            at = parse_bound(options['at'])
+            if at is None:
+                raise CommandError('--at must be an ISO date or datetime.')
+            if at > timezone.now():
+                # Movements recorded later, but dated before it, would be missing from it.
+                raise CommandError('--at must not be in the future.')
+        else:
+            at = timezone.now() - timedelta(seconds=options['settle_seconds'])
+        created = StockSnapshot.take(at, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted stock for {created} products as of {at.isoformat()}."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.movements import parse_bound
+from inventory.reports import valuation, write_valuation_csv
+
+
+class Command(BaseCommand):
+    help = 'Report stock valuation per category and for the whole catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='ISO date or datetime to value stock at (default: now)')
+        parser.add_argument('--csv', action='store_true', help='Write CSV instead of a table')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            as_of = parse_bound(options['as_of'], upper=True)
+            if as_of is None:
+                raise CommandError('--as-of must be an ISO date or datetime.')
+        report = valuation(as_of)
+
+        if options['csv']:
+            write_valuation_csv(report, self.stdout)
+            return
+        row = '{:<24} {:>8} {:>10} {:>16} {:>14} {:>16}'
+        self.stdout.write(row.format('Category', 'Products', 'Units', 'Total', 'Discount', 'Final total'))
+        for line in report['categories'] + [{'label': 'Catalog', **report['catalog']}]:
+            self.stdout.write(row.format(
+                line['label'], line['products'], line['units'], line['total'], line['discount'], line['final_total'],
+            ))
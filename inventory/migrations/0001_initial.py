@@ -0,0 +1,190 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.utils.timezone
+import inventory.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Coupon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True)),
+                ('discount_percent', models.DecimalField(decimal_places=2, help_text='Discount percentage (e.g. 10 for 10%)', max_digits=5)),
+                ('active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('stored_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('sku', models.CharField(max_length=50, unique=True)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True)),
+                ('image', models.ImageField(blank=True, null=True, storage=inventory.storage.product_image_storage, upload_to='product_images/')),
+                ('image_renditions', models.JSONField(blank=True, default=dict, editable=False)),
+                ('category', models.CharField(choices=[('other', 'Other'), ('electronics', 'Electronics'), ('clothing', 'Clothing'), ('home', 'Home'), ('toys', 'Toys'), ('books', 'Books'), ('sports', 'Sports'), ('automotive', 'Automotive'), ('health', 'Health'), ('beauty', 'Beauty'), ('garden', 'Garden'), ('computers', 'Computers'), ('jewelry', 'Jewelry'), ('musical_instruments', 'Musical Instruments'), ('office_products', 'Office Products'), ('pet_supplies', 'Pet Supplies'), ('tools', 'Tools'), ('video_games', 'Video Games'), ('baby', 'Baby'), ('groceries', 'Groceries'), ('furniture', 'Furniture'), ('appliances', 'Appliances'), ('clothing_shoes', 'Clothing & Shoes'), ('bags', 'Bags'), ('accessories', 'Accessories'), ('watches', 'Watches'), ('phones', 'Phones'), ('tablets', 'Tablets'), ('cameras', 'Cameras'), ('drones', 'Drones')], default='other', max_length=30)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('coupon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='inventory.coupon')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductModification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modified_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_by', models.CharField(max_length=100)),
+                ('change_description', models.TextField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='modifications', to='inventory.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockAdjustment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('before', models.IntegerField()),
+                ('after', models.IntegerField()),
+                ('adjustment_date', models.DateTimeField(auto_now_add=True)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_adjustments', to='inventory.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balance', to='inventory.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockManagement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('in', 'Stock In'), ('out', 'Stock Out'), ('adjust', 'Adjustment'), ('correction', 'Correction')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('transaction_date', models.DateTimeField(auto_now_add=True)),
+                ('note', models.TextField(blank=True, default='')),
+                ('price_at_transaction', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total_value', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('coupon_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('discount_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('discount_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('final_value', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('performed_by', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='inventory.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockEntry',
+            fields=[
+            ],
+            options={
+                'verbose_name_plural': 'stock entries',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('inventory.stockmanagement',),
+        ),
+        migrations.CreateModel(
+            name='StockExit',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('inventory.stockmanagement',),
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'id'], name='product_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name', 'id'], name='product_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['image'], name='product_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockadjustment',
+            index=models.Index(fields=['product', 'adjustment_date', 'id'], name='adjustment_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockadjustment',
+            index=models.Index(fields=['-adjustment_date'], name='adjustment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmanagement',
+            index=models.Index(fields=['product', 'transaction_date', 'id'], name='ledger_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmanagement',
+            index=models.Index(fields=['-transaction_date'], name='ledger_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmanagement',
+            index=models.Index(fields=['transaction_type', '-transaction_date'], name='ledger_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmanagement',
+            index=models.Index(fields=['performed_by', '-transaction_date'], name='ledger_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'taken_at'), name='unique_product_snapshot'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations
+
+
+def search_index():
+    return GinIndex(fields=['search_vector'], name='product_search_idx')
+
+
+def add_index(apps, schema_editor):
+    # Only PostgreSQL stores search vectors; other databases search in process (inventory.search).
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('inventory', 'Product'), search_index())
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('inventory', 'Product'), search_index())
+
+
+class Migration(migrations.Migration):
+    # Kept out of the model state (Product.Meta) so makemigrations' output is the same on every database.
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
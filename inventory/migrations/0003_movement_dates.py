@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_product_search_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockadjustment',
+            name='adjustment_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='stockmanagement',
+            name='transaction_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,5 +1,17 @@
-from django.db import models
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+
+from .search import WEIGHTS, search_vector
+from .storage import product_image_storage
+
+# Earlier than any movement; stands in for "no snapshot" when replaying history.
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
 
 
 class Coupon(models.Model):
@@ -11,6 +23,50 @@ class Coupon(models.Model):
         return f"{self.code} ({self.discount_percent}%)"
 
 
+def _movement_total(queryset, total):
+    """Correlated subquery summing ``total`` over one product's movement rows."""
+    rows = queryset.filter(product=OuterRef('pk')).order_by().values('product').annotate(total=total)
+    return Coalesce(Subquery(rows.values('total')), 0)
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Annotate ``stock`` in the same query: the stored StockBalance when there
+        is one, otherwise the ledger and adjustments aggregated in the database.
+        """
+        aggregated = (
+            _movement_total(StockManagement.objects.all(), Sum('quantity'))
+            + _movement_total(StockAdjustment.objects.all(), Sum(F('after') - F('before')))
+        )
+        return self.annotate(stock=Coalesce(F('stock_balance__quantity'), aggregated))
+
+    def with_stock_as_of(self, at):
+        """
+        Annotate ``stock`` as it stood at ``at``: the latest StockSnapshot taken
+        at or before then (``snapshot_at``), plus only the movements after it.
+        """
+        snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=at).order_by('-taken_at')
+        products = self.annotate(
+            snapshot_at=Subquery(snapshots.values('taken_at')[:1]),
+            snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), 0),
+        )
+        replay_from = Coalesce(OuterRef('snapshot_at'), Value(EPOCH, output_field=models.DateTimeField()))
+        ledger = StockManagement.objects.filter(transaction_date__gt=replay_from, transaction_date__lte=at)
+        adjustments = StockAdjustment.objects.filter(adjustment_date__gt=replay_from, adjustment_date__lte=at)
+        return products.annotate(stock=(
+            F('snapshot_quantity')
+            + _movement_total(ledger, Sum('quantity'))
+            + _movement_total(adjustments, Sum(F('after') - F('before')))
+        ))
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    def get_queryset(self):
+        # The search vector is only read inside the database (inventory.search).
+        return super().get_queryset().defer('search_vector')
+
+
 class Product(models.Model):
     CATEGORY_CHOICES = [
         ('other', 'Other'),
@@ -50,18 +106,67 @@ class Product(models.Model):
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    image = models.ImageField(upload_to='product_images/', storage=product_image_storage, blank=True, null=True)
+    # Storage names of the image's resized copies, made by inventory.images:
+    # {"source": <image name>, "thumbnail": {"webp": ..., "jpeg": ...}, "medium": {...}}.
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     category = models.CharField(max_length=30, choices=CATEGORY_CHOICES, default='other')
     coupon = models.ForeignKey('Coupon', on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
+    # Weighted words of the searched fields, on PostgreSQL only; see inventory.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # When the searched fields last changed; other databases' search indexes catch up from it.
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = ProductManager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination orders by (name, id) or id, optionally within a category.
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['category', 'id'], name='product_category_id_idx'),
+            models.Index(fields=['category', 'name', 'id'], name='product_category_name_idx'),
+            # Grouped feed and price-ordered category listings.
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            # Counting the products that share a stored image (inventory.storage).
+            models.Index(fields=['image'], name='product_image_idx'),
+            # Catching the in-process search indexes up (inventory.search).
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+        ]
+        # On PostgreSQL a migration also adds a GIN index on search_vector
+        # (product_search_idx); the model state is the same on every database.
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(WEIGHTS) & set(update_fields):
+            self.search_vector = search_vector(self) if connection.vendor == 'postgresql' else None
+            self.updated_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_vector', 'updated_at'}
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # New products start with a balance row, so their first movements only ever update it.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            StockBalance.objects.create(product=self)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image, so a save that replaces it can release the old file.
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
+
     def current_stock(self):
-        stock_in = sum(entry.quantity for entry in self.stock_entries.all())
-        stock_out = sum(exit.quantity for exit in self.stock_exits.all())
-        adjustments = sum(adj.after - adj.before for adj in self.stock_adjustments.all())
-        return stock_in - stock_out + adjustments
+        try:
+            return self.stock_balance.quantity
+        except StockBalance.DoesNotExist:
+            # Products with history recorded before balances existed.
+            StockBalance.ensure(self)
+            return StockBalance.objects.get(product=self).quantity
 
     def total_value(self):
         total = self.current_stock() * self.price
@@ -77,6 +182,19 @@ class Product(models.Model):
             'coupon_code': coupon_code
         }
 
+class MediaBlob(models.Model):
+    """A file in content-addressed storage (inventory.storage), shared by every product using it."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    # Last time an upload resolved to this blob; recent blobs are spared by garbage collection.
+    stored_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+
 class ProductModification(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='modifications')
     modified_at = models.DateTimeField(auto_now_add=True)
@@ -88,7 +206,130 @@ class ProductModification(models.Model):
     
 
 
-class StockManagement(models.Model):
+class InsufficientStock(ValueError):
+    def __init__(self, message='Not enough stock to complete this operation.'):
+        super().__init__(message)
+
+
+class StockBalance(models.Model):
+    """Denormalized on-hand quantity per product, kept in sync by stock movements."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock_balance')
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.name} | {self.quantity}"
+
+    @classmethod
+    def compute(cls, product_ids=None):
+        """Sum the ledger and adjustments per product, returning {product_id: quantity}."""
+        sources = [
+            (StockManagement.objects, Sum('quantity')),
+            (StockAdjustment.objects, Sum(F('after') - F('before'))),
+        ]
+        balances = {}
+        for manager, total in sources:
+            rows = manager.all()
+            if product_ids is not None:
+                rows = rows.filter(product_id__in=product_ids)
+            for product_id, quantity in rows.values('product_id').annotate(total=total).values_list('product_id', 'total'):
+                balances[product_id] = balances.get(product_id, 0) + (quantity or 0)
+        return balances
+
+    @classmethod
+    def ensure(cls, product, pending=0):
+        """
+        Create the product's balance row from its movement history if it is
+        missing (products get one when created, but not those from before
+        balances existed or made with bulk_create). ``pending`` is this
+        transaction's change that the caller has yet to add to the row. When
+        another transaction creates the row first, its row is kept: a computed
+        total is only written into a new row, never over one, and every change
+        is then added with an F() update.
+        """
+        product_id = getattr(product, 'pk', product)
+        if cls.objects.filter(product_id=product_id).exists():
+            return
+        quantity = cls.compute([product_id]).get(product_id, 0) - pending
+        try:
+            with transaction.atomic():
+                cls.objects.create(product_id=product_id, quantity=quantity)
+        except IntegrityError:
+            pass
+
+    @classmethod
+    def apply(cls, product, delta, allow_negative=True):
+        """
+        Atomically add ``delta`` to the product's balance, creating it on first use.
+        With ``allow_negative=False`` a decrement is a conditional UPDATE that only
+        matches when enough stock is on hand, raising InsufficientStock otherwise.
+        The UPDATE holds the row lock until commit, so concurrent stock-outs of one
+        product cannot oversell it while other products are not blocked.
+        """
+        product_id = getattr(product, 'pk', product)
+        balances = cls.objects.filter(product_id=product_id)
+        if delta < 0 and not allow_negative:
+            balances = balances.filter(quantity__gte=-delta)
+        if balances.update(quantity=F('quantity') + delta, updated_at=timezone.now()):
+            return
+        # No row matched: there is none yet, or not enough stock. The movement is already
+        # written, so the history includes it; leave it to the update.
+        cls.ensure(product_id, pending=delta)
+        if not balances.update(quantity=F('quantity') + delta, updated_at=timezone.now()):
+            raise InsufficientStock()
+
+
+class StockMovement(models.Model):
+    """
+    Base for movement rows that affect on-hand stock. Saving or deleting a row
+    updates the product's StockBalance in the same transaction, and saving one
+    that would take stock below zero raises InsufficientStock. Queryset-level
+    updates and deletes bypass this, so run ``rebuild_stock_balances`` after them.
+    Editing or deleting a row also drops the product's StockSnapshots taken at
+    or after its date, which no longer match the history.
+    """
+    date_field = None
+
+    class Meta:
+        abstract = True
+
+    def stock_delta(self):
+        raise NotImplementedError
+
+    def drop_later_snapshots(self):
+        StockSnapshot.objects.filter(product_id=self.product_id, taken_at__gte=getattr(self, self.date_field)).delete()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = type(self)._base_manager.filter(pk=self.pk).first()
+            if previous is not None:
+                # Build any missing balance from the history as it stands before the
+                # edit, so the deltas below are the only record of the change.
+                StockBalance.ensure(previous.product_id)
+                StockBalance.ensure(self.product_id)
+            super().save(*args, **kwargs)
+            if previous is not None:
+                previous.drop_later_snapshots()
+                self.drop_later_snapshots()
+                StockBalance.apply(previous.product_id, -previous.stock_delta())
+            StockBalance.apply(self.product_id, self.stock_delta(), allow_negative=False)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.drop_later_snapshots()
+            StockBalance.apply(self.product_id, -self.stock_delta())
+        return result
+
+
+class StockManagement(StockMovement):
+    """
+    The stock ledger: every stock-in and stock-out is one row here, priced and
+    discounted at transaction time. StockEntry and StockExit are proxy views
+    over it.
+    """
     TRANSACTION_TYPES = [
         ('in', 'Stock In'),
         ('out', 'Stock Out'),
@@ -96,13 +337,17 @@ class StockManagement(models.Model):
         ('correction', 'Correction'),
     ]
 
-    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='transactions')
+    date_field = 'transaction_date'
+
+    # product and performed_by lead composite indexes below, so they skip their own.
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='transactions', db_index=False)
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     quantity = models.IntegerField()  # Positive for in, negative for out, diff for adjust
-    transaction_date = models.DateTimeField(auto_now_add=True)
+    # Now unless given, e.g. by generate_dummy_stock spreading movements over the past.
+    transaction_date = models.DateTimeField(default=timezone.now, editable=False)
     note = models.TextField(blank=True, default='')
     performed_by = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, db_index=False
     )
     price_at_transaction = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     total_value = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
@@ -111,8 +356,18 @@ class StockManagement(models.Model):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     final_value = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        # Set price and discount info at transaction time
+    class Meta:
+        indexes = [
+            # Per-product history in date order: movement log, as-of replay, balance rebuilds.
+            models.Index(fields=['product', 'transaction_date', 'id'], name='ledger_product_date_idx'),
+            # Admin changelist: newest first, optionally filtered by type or user.
+            models.Index(fields=['-transaction_date'], name='ledger_date_idx'),
+            models.Index(fields=['transaction_type', '-transaction_date'], name='ledger_type_date_idx'),
+            models.Index(fields=['performed_by', '-transaction_date'], name='ledger_user_date_idx'),
+        ]
+
+    def set_pricing(self):
+        """Set price and discount info at transaction time from the product and its coupon."""
         if not self.price_at_transaction:
             self.price_at_transaction = self.product.price
         self.total_value = abs(self.quantity) * self.price_at_transaction
@@ -123,78 +378,134 @@ class StockManagement(models.Model):
         else:
             self.discount_amount = 0
         self.final_value = self.total_value - (self.discount_amount or 0)
+
+    def stock_delta(self):
+        return self.quantity
+
+    def save(self, *args, **kwargs):
+        self.set_pricing()
         # Standard business logic for stock management
         if self.transaction_type == 'in' and self.quantity <= 0:
             raise ValueError('Stock In quantity must be positive.')
         if self.transaction_type == 'out' and self.quantity >= 0:
             raise ValueError('Stock Out quantity must be negative.')
-        if self.transaction_type == 'out':
-            current_stock = self.product.current_stock()
-            if current_stock + self.quantity < 0:
-                raise ValueError('Not enough stock to complete this operation.')
+        # StockMovement refuses to take the balance below zero.
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.product.name} | {self.transaction_type} | {self.quantity} | {self.transaction_date} | {self.final_value}"
 
-class StockEntry(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_entries')
-    quantity = models.PositiveIntegerField()
-    entry_date = models.DateTimeField(auto_now_add=True)
-    reason = models.CharField(max_length=255, blank=True)
-    performed_by = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
-    )
+class StockEntryManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(transaction_type='in')
+
+
+class StockEntry(StockManagement):
+    """Stock-in rows of the ledger, under their legacy names."""
+    objects = StockEntryManager()
+
+    class Meta:
+        proxy = True
+        verbose_name_plural = 'stock entries'
+
+    @property
+    def entry_date(self):
+        return self.transaction_date
+
+    @property
+    def reason(self):
+        return self.note
+
+    @reason.setter
+    def reason(self, value):
+        self.note = value
+
     def __str__(self):
         return f"{self.product.name} | IN | {self.quantity} | {self.entry_date}"
 
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
+        self.transaction_type = 'in'
         super().save(*args, **kwargs)
-        if is_new:
-            from .models import StockManagement
-            StockManagement.objects.create(
-                product=self.product,
-                transaction_type='in',
-                quantity=self.quantity,
-                note=self.reason,
-                performed_by=self.performed_by,
-                transaction_date=self.entry_date
-            )
-
-class StockExit(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_exits')
-    quantity = models.PositiveIntegerField()
-    exit_date = models.DateTimeField(auto_now_add=True)
-    reason = models.CharField(max_length=255, blank=True)
-    performed_by = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
-    )
+
+class StockExitManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(transaction_type='out')
+
+
+class StockExit(StockManagement):
+    """Stock-out rows of the ledger, under their legacy names. Quantities are stored negative."""
+    objects = StockExitManager()
+
+    class Meta:
+        proxy = True
+
+    @property
+    def exit_date(self):
+        return self.transaction_date
+
+    @property
+    def reason(self):
+        return self.note
+
+    @reason.setter
+    def reason(self, value):
+        self.note = value
+
     def __str__(self):
-        return f"{self.product.name} | OUT | {self.quantity} | {self.exit_date}"
+        return f"{self.product.name} | OUT | {-self.quantity} | {self.exit_date}"
 
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
+        self.transaction_type = 'out'
+        self.quantity = -abs(self.quantity)  # negative for out
         super().save(*args, **kwargs)
-        if is_new:
-            from .models import StockManagement
-            StockManagement.objects.create(
-                product=self.product,
-                transaction_type='out',
-                quantity=-self.quantity,  # negative for out
-                note=self.reason,
-                performed_by=self.performed_by,
-                transaction_date=self.exit_date
-            )
-
-class StockAdjustment(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_adjustments')
+
+class StockAdjustment(StockMovement):
+    date_field = 'adjustment_date'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_adjustments', db_index=False)
     before = models.IntegerField()
     after = models.IntegerField()
-    adjustment_date = models.DateTimeField(auto_now_add=True)
+    adjustment_date = models.DateTimeField(default=timezone.now, editable=False)
     reason = models.CharField(max_length=255, blank=True)
     performed_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
     )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'adjustment_date', 'id'], name='adjustment_product_date_idx'),
+            models.Index(fields=['-adjustment_date'], name='adjustment_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} | ADJUST | {self.before}→{self.after} | {self.adjustment_date}"
+
+    def stock_delta(self):
+        return self.after - self.before
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's on-hand quantity as of ``taken_at``. Historical stock queries
+    start from the latest snapshot instead of replaying the whole history.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Also the index behind "latest snapshot at or before D" lookups.
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='unique_product_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} | {self.quantity} | {self.taken_at}"
+
+    @classmethod
+    def take(cls, at, batch_size=1000):
+        """Checkpoint every product's stock as of ``at``, built on the previous snapshots."""
+        stock = Product.objects.with_stock_as_of(at).values_list('id', 'stock')
+        snapshots = [cls(product_id=product_id, quantity=quantity, taken_at=at) for product_id, quantity in stock]
+        cls.objects.bulk_create(snapshots, batch_size=batch_size, ignore_conflicts=True)
+        return len(snapshots)
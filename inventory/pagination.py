@@ -0,0 +1,73 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination over products, so deep pages cost the same as the first.
+    ``ordering`` may be id, -id, name or -name; name orderings break ties on id
+    and are backed by the (name, id) index on Product.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering_param = 'ordering'
+    allowed_orderings = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        return self.allowed_orderings.get(request.query_params.get(self.ordering_param), (self.ordering,))
+
+
+def _after(ordering, position):
+    """Q matching rows that come after ``position`` (values of the ``ordering`` fields)."""
+    condition = Q(pk__in=[])
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        ties = {other.lstrip('-'): value for other, value in zip(ordering[:i], position[:i])}
+        condition |= Q(**ties, **{f'{name}__{lookup}': position[i]})
+    return condition
+
+
+async def apaginate_products(queryset, request):
+    """
+    ProductCursorPagination for async views, with the same ordering and page_size
+    parameters, evaluated with the async ORM. Pages only go forward: the cursor
+    holds the last row's ordering values. Returns (rows, next_url); rows may be
+    model instances or dicts.
+    """
+    params = ProductCursorPagination
+    ordering = params.allowed_orderings.get(request.GET.get(params.ordering_param), (params.ordering,))
+    page_size = request.GET.get(params.page_size_query_param, '')
+    page_size = min(int(page_size), params.max_page_size) if page_size.isdigit() and int(page_size) > 0 else params.page_size
+
+    cursor = request.GET.get(params.cursor_query_param)
+    if cursor:
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise NotFound(params.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(ordering):
+            raise NotFound(params.invalid_cursor_message)
+        queryset = queryset.filter(_after(ordering, position))
+
+    rows = [row async for row in queryset.order_by(*ordering)[:page_size + 1]]
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        position = [last[f.lstrip('-')] if isinstance(last, dict) else getattr(last, f.lstrip('-')) for f in ordering]
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        next_url = replace_query_param(request.build_absolute_uri(), params.cursor_query_param, cursor)
+    return rows, next_url
@@ -0,0 +1,234 @@
+"""
+Ranked product search over name, sku, description and category.
+
+On PostgreSQL each product stores a weighted tsvector (Product.search_vector,
+written on save and by the rebuild_search_index command) that a GIN index
+matches against a prefix tsquery; results are ordered by ts_rank. Other
+databases use an in-process inverted index instead, built on first use and
+caught up with product changes on later searches (see _inverted_index).
+Both use PostgreSQL's 'simple' configuration (lowercased words, no
+stemming), and every word of a query matches as a prefix (from
+MIN_PREFIX_LENGTH characters on), so partial input works for typeahead.
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+from datetime import timedelta
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Count, F, Func, Max, TextField, Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Searched field -> weight. ts_rank's default weights are A=1.0, B=0.4, C=0.2, D=0.1.
+WEIGHTS = {'name': 'A', 'sku': 'A', 'category': 'B', 'description': 'C'}
+RANK_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+# Seconds of updates re-read when catching up with a newer catalog version.
+CATCH_UP_OVERLAP = 60
+# Shorter words only match whole words: a one-letter prefix matches most of the
+# catalog, and ranking all of it is slow and tells the user nothing.
+MIN_PREFIX_LENGTH = 2
+WORD = re.compile(r'[^\W_]+')
+
+_state = None  # (catalog version, InvertedIndex)
+_rebuilding = False
+_lock = threading.Lock()
+
+
+def words(text):
+    """Split text into lowercase words, the way the 'simple' configuration does for plain words."""
+    return WORD.findall((text or '').lower())
+
+
+def _document(field, product):
+    # Split into words before PostgreSQL parses the text, which would otherwise read
+    # "BULB-1" as "bulb" and "-1" and never match a search for "bulb 1".
+    if product is None:
+        return Func(Lower(field), Value('[^[:alnum:]]+'), Value(' '), Value('g'), function='regexp_replace', output_field=TextField())
+    return Value(' '.join(words(getattr(product, field))))
+
+
+def search_vector(product=None):
+    """The weighted search vector of the stored columns, or of ``product``'s current values."""
+    vectors = [SearchVector(_document(field, product), weight=weight, config='simple') for field, weight in WEIGHTS.items()]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector + other
+    return vector
+
+
+def prefix_query(prefixes):
+    """A tsquery matching documents with a word starting with each prefix (which must be words())."""
+    terms = [prefix + (':*' if len(prefix) >= MIN_PREFIX_LENGTH else '') for prefix in prefixes]
+    return SearchQuery(' & '.join(terms), search_type='raw', config='simple')
+
+
+class InvertedIndex:
+    """
+    Word -> {product id: weighted occurrences}, with the words sorted for
+    prefix lookups. Searches read it without a lock, so it is never changed in
+    place: replaced() returns an updated copy that shares the untouched parts.
+    """
+
+    def __init__(self, products=()):
+        self.postings = {}
+        self.documents = {}  # Product id -> its words, to remove it again.
+        for product in products:
+            self._add(product)
+        self.words = sorted(self.postings)
+
+    def _add(self, product, copy=False):
+        product_id, scores = product['id'], {}
+        for field, weight in WEIGHTS.items():
+            weight = RANK_WEIGHTS[weight]
+            for word in words(product[field]):
+                scores[word] = scores.get(word, 0) + weight
+        for word, score in scores.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                self.postings[word] = {product_id: score}
+            elif copy:
+                self.postings[word] = {**posting, product_id: score}
+            else:
+                posting[product_id] = score
+        self.documents[product_id] = tuple(scores)
+
+    def replaced(self, products):
+        """A copy with ``products`` ({id: values, or None when deleted}) updated."""
+        index = InvertedIndex()
+        index.postings, index.documents, index.words = dict(self.postings), dict(self.documents), list(self.words)
+        for product_id, product in products.items():
+            for word in index.documents.pop(product_id, ()):
+                posting = {other: score for other, score in index.postings[word].items() if other != product_id}
+                if posting:
+                    index.postings[word] = posting
+                else:
+                    del index.postings[word]
+                    del index.words[bisect.bisect_left(index.words, word)]
+            if product is not None:
+                index._add(product, copy=True)
+                for word in index.documents[product_id]:
+                    if len(index.postings[word]) == 1:
+                        bisect.insort(index.words, word)
+        return index
+
+    def matches(self, prefix):
+        """{product id: score} of the products with a word starting with ``prefix``."""
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return dict(self.postings.get(prefix, {}))
+        scores = {}
+        position = bisect.bisect_left(self.words, prefix)
+        while position < len(self.words) and self.words[position].startswith(prefix):
+            for product_id, score in self.postings[self.words[position]].items():
+                if score > scores.get(product_id, 0):
+                    scores[product_id] = score
+            position += 1
+        return scores
+
+    def search(self, prefixes, limit):
+        """Ids of the best ``limit`` products matching every prefix, best first."""
+        scores = None
+        # Rarest first, so the running intersection stays small.
+        for matched in sorted((self.matches(prefix) for prefix in prefixes), key=len):
+            if scores is None:
+                scores = matched
+            else:
+                scores = {product_id: score + matched[product_id] for product_id, score in scores.items() if product_id in matched}
+            if not scores:
+                return []
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, _ in best]
+
+
+def _catalog_version():
+    """(product count, latest Product.updated_at): changes whenever a product is saved, created or deleted."""
+    from .models import Product
+
+    totals = Product.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return totals['count'], totals['updated']
+
+
+def _products(**filters):
+    from .models import Product
+
+    return Product.objects.filter(**filters).values('id', *WEIGHTS).iterator(chunk_size=2000)
+
+
+def _rebuild():
+    global _state, _rebuilding
+    try:
+        version = _catalog_version()
+        index = InvertedIndex(_products())
+        with _lock:
+            _state = (version, index)
+    except Exception:
+        logger.exception('Could not rebuild the product search index')
+    finally:
+        _rebuilding = False
+        # The thread outlives any request, so nothing else would close its connection.
+        connection.close()
+
+
+def _inverted_index():
+    """
+    This process's index, current as of the catalog version read now. Only the
+    first search builds it on the request path. Later versions are caught up
+    by re-reading the products updated since the last one (with an overlap,
+    for transactions that committed out of order); if that leaves the count
+    off, products were deleted elsewhere, and a full rebuild runs in the
+    background while searches keep using the caught-up index.
+    """
+    global _state, _rebuilding
+    version = _catalog_version()
+    state = _state
+    if state is not None and state[0] == version:
+        return state[1]
+    with _lock:
+        state = _state
+        if state is None:
+            state = _state = (version, InvertedIndex(_products()))
+        elif state[0] != version:
+            (_, updated), index = state
+            since = {'updated_at__gte': updated - timedelta(seconds=CATCH_UP_OVERLAP)} if updated else {}
+            changed = _products(**since)
+            index = index.replaced({product['id']: product for product in changed})
+            state = _state = (version, index)
+            if len(index.documents) != version[0] and not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=_rebuild, name='product-search-index', daemon=True).start()
+        return state[1]
+
+
+def forget_product(product_id):
+    """Drop a deleted product from this process's index once the deletion commits."""
+    global _state
+    with _lock:
+        if _state is not None:
+            _state = (_state[0], _state[1].replaced({product_id: None}))
+
+
+def search_products(queryset, text, limit):
+    """The products of ``queryset`` matching every word of ``text`` as a prefix, best match first."""
+    prefixes = words(text)
+    if not prefixes:
+        return []
+    if connection.vendor == 'postgresql':
+        query = prefix_query(prefixes)
+        ranked = queryset.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+        return list(ranked.order_by('-rank', 'id')[:limit])
+    product_ids = _inverted_index().search(prefixes, limit)
+    products = queryset.in_bulk(product_ids)
+    return [products[product_id] for product_id in product_ids if product_id in products]
+
+
+def update_search_vectors(queryset):
+    """Recompute the stored search vectors, e.g. after bulk_create() or update(), which skip Product.save()."""
+    if connection.vendor == 'postgresql':
+        return queryset.update(search_vector=search_vector())
+    # The in-process indexes pick up recently updated products on the next search.
+    return queryset.update(updated_at=timezone.now())
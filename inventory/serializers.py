@@ -1,14 +1,55 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from .images import RENDITIONS
 from .models import Product, ProductModification
 
 class ProductSerializer(serializers.ModelSerializer):
+    # {"thumbnail": {"webp": url, "jpeg": url}, "medium": {...}}, or null until they are generated.
+    image_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'sku', 'quantity', 'price',
-            'description', 'image', 'category'
+            'description', 'image', 'image_renditions', 'category'
         ]
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset: only serialize the requested fields.
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_image_renditions(self, product):
+        renditions = product.image_renditions
+        if not product.image or renditions.get('source') != product.image.name:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for name in RENDITIONS:
+            urls[name] = {}
+            for extension, storage_name in renditions[name].items():
+                url = default_storage.url(storage_name)
+                urls[name][extension] = request.build_absolute_uri(url) if request else url
+        return urls
+
+    @classmethod
+    def requested_fields(cls, params):
+        """Parse ``?fields=a,b`` from query params into the subset of known fields, or None for all."""
+        fields = params.get('fields')
+        if not fields:
+            return None
+        return [name for name in fields.split(',') if name in cls.Meta.fields] or None
+
+    @staticmethod
+    def model_fields(fields):
+        """Model fields to load for a sparse fieldset; cursor positions need id and name even when not returned."""
+        names = {'id', 'name', *fields}
+        if 'image_renditions' in names:
+            names.add('image')  # Renditions are only served while they match the image.
+        return names
+
 class ProductModificationSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     class Meta:
@@ -0,0 +1,75 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .images import schedule_renditions
+from .models import Coupon, Product, StockAdjustment, StockEntry, StockExit, StockManagement
+from .search import forget_product
+from .storage import release_media
+
+
+def bump_on_commit(product_ids):
+    # Bumping before the commit would let a concurrent read cache the old rows
+    # under the new version, where they would stay until the next write.
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: bump_catalog_version(product_ids))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    bump_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # Saves reach the search index through Product.updated_at, but a deletion
+    # leaves no row behind to catch up from.
+    if connection.vendor != 'postgresql':
+        product_id = instance.pk
+        transaction.on_commit(lambda: forget_product(product_id))
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, **kwargs):
+    if (instance.image.name or '') != instance.image_renditions.get('source', ''):
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def product_image_stored(sender, instance, created, **kwargs):
+    previous, current = getattr(instance, '_loaded_image', None), instance.image.name
+    if created or previous != current:
+        names = [previous, current]
+        transaction.on_commit(lambda: release_media(names))
+        instance._loaded_image = current
+
+
+@receiver(post_delete, sender=Product)
+def product_image_released(sender, instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: release_media([name]))
+
+
+@receiver(pre_delete, sender=Coupon)
+def coupon_deleting(sender, instance, **kwargs):
+    # SET_NULL detaches the products before post_delete, so remember them now.
+    instance._product_ids = list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Coupon)
+def coupon_changed(sender, instance, **kwargs):
+    bump_on_commit(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Coupon)
+def coupon_deleted(sender, instance, **kwargs):
+    bump_on_commit(getattr(instance, '_product_ids', ()))
+
+
+@receiver([post_save, post_delete], sender=StockEntry)
+@receiver([post_save, post_delete], sender=StockExit)
+@receiver([post_save, post_delete], sender=StockAdjustment)
+@receiver([post_save, post_delete], sender=StockManagement)
+def stock_changed(sender, instance, **kwargs):
+    bump_on_commit([instance.product_id])
@@ -0,0 +1,105 @@
+"""
+Content-addressed storage for product images.
+
+An upload is stored under the SHA-256 of its bytes, e.g.
+product_images/3f/3f2a...9c.jpg, so the same photo uploaded for many products
+is kept on disk once. The digest is computed while the upload streams in
+(HashingTemporaryFileUploadHandler), or from the content's chunks otherwise.
+Each stored file has a MediaBlob row, whose ref_count is the number of products
+using it. When a product is deleted or its image replaced, blobs left without
+references are deleted (see release_media), along with their renditions
+(inventory.images); gc_media catches any that slip through.
+"""
+import hashlib
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, hashing them on the way (``file.sha256``)."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+
+def content_digest(content):
+    digest = getattr(content, 'sha256', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+        content.seek(0)
+    return digest
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by their content and records them as MediaBlobs."""
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so an existing file is reused, never renamed.
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        digest = content_digest(content)
+        directory, extension = posixpath.dirname(name), posixpath.splitext(name)[1].lower()
+        blob_name = posixpath.join(directory, digest[:2], digest + extension)
+        # The row lock keeps release_media() from deleting the file while it is being reused.
+        with transaction.atomic():
+            blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                sha256=digest, defaults={'name': blob_name, 'size': content.size},
+            )
+            if not created:
+                blob.stored_at = timezone.now()
+                blob.save(update_fields=['stored_at'])
+            if not self.exists(blob.name):
+                super()._save(blob.name, content)
+        return blob.name
+
+
+def product_image_storage():
+    return ContentAddressedStorage()
+
+
+def release_media(names):
+    """
+    Recount the references to the given blobs and delete those no product uses,
+    with their renditions. Blobs stored within MEDIA_GC_GRACE_SECONDS are kept, since the product
+    they were uploaded for may not be committed yet.
+    """
+    from .images import rendition_names, rendition_paths
+    from .models import MediaBlob, Product
+
+    storage = product_image_storage()
+    cutoff = timezone.now() - timedelta(seconds=settings.MEDIA_GC_GRACE_SECONDS)
+    for name in sorted(set(filter(None, names))):
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                continue  # Not content-addressed, e.g. an image stored before MediaBlob existed.
+            references = Product.objects.filter(image=name).count()
+            if references or blob.stored_at > cutoff:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=references)
+            else:
+                blob.delete()
+                storage.delete(name)
+                for rendition in rendition_names(rendition_paths(blob.sha256)):
+                    default_storage.delete(rendition)
@@ -1,3 +1,908 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from pathlib import PurePosixPath
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Account
+from . import search
+from .images import generate_renditions, rendition_names
+from .models import (
+    Coupon, MediaBlob, Product, ProductModification, StockAdjustment, StockBalance, StockEntry, StockExit, StockManagement,
+    StockSnapshot,
+)
+from .serializers import ProductSerializer
+from .views import StockBulkMovementView
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentStockOutTests(TransactionTestCase):
+    """Many threads posting to stock-out/ at once must never oversell a product."""
+    threads = 16
+    attempts_per_thread = 5
+
+    def setUp(self):
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.token = Token.objects.create(user=staff).key
+        self.products = [
+            Product.objects.create(name=f'Product {i}', sku=f'SKU-STRESS-{i}', quantity=0, price=Decimal('10.00'))
+            for i in range(2)
+        ]
+        for product in self.products:
+            StockEntry.objects.create(product=product, quantity=30)
+
+    def post_stock_outs(self, product, statuses):
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+        try:
+            for _ in range(self.attempts_per_thread):
+                response = client.post(
+                    '/api/inventory/stock-out/',
+                    {'product_id': product.id, 'quantity': 1},
+                    content_type='application/json',
+                )
+                statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_concurrent_stock_outs_never_oversell(self):
+        statuses = {product.id: [] for product in self.products}
+        workers = [
+            threading.Thread(target=self.post_stock_outs, args=(product, statuses[product.id]))
+            for product in self.products
+            for _ in range(self.threads // len(self.products))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(statuses[product.id].count(201), 30)
+            self.assertEqual(statuses[product.id].count(400), 10)
+            self.assertEqual(product.current_stock(), 0)
+            self.assertEqual(StockExit.objects.filter(product=product).count(), 30)
+            self.assertEqual(product.transactions.filter(transaction_type='out').count(), 30)
+
+    def test_concurrent_first_movements_are_all_counted(self):
+        product = self.products[0]
+        StockBalance.objects.filter(product=product).delete()  # As for a product from before balances existed.
+        statuses = []
+
+        def stock_in():
+            client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+            try:
+                response = client.post('/api/inventory/stock-in/', {'product_id': product.id, 'quantity': 1}, content_type='application/json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=stock_in) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(statuses, [201] * self.threads)
+        self.assertEqual(StockBalance.objects.get(product=product).quantity, 30 + self.threads)
+
+
+class StockBalanceTests(TestCase):
+    """Balance rows are only ever created from history or adjusted by F() updates, never overwritten."""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1', quantity=0, price=Decimal('20.00'))
+
+    def test_new_product_has_a_balance(self):
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 0)
+
+    def test_missing_balance_is_built_from_history(self):
+        StockEntry.objects.create(product=self.product, quantity=10)
+        StockBalance.objects.filter(product=self.product).delete()
+        StockExit.objects.create(product=self.product, quantity=4)
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 6)
+
+    def test_editing_a_movement_without_a_balance_counts_it_once(self):
+        other = Product.objects.create(name='Bulb', sku='BULB-1', quantity=0, price=Decimal('3.00'))
+        entry = StockEntry.objects.create(product=self.product, quantity=10)
+        StockBalance.objects.all().delete()
+        entry.quantity = 4
+        entry.save()
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 4)
+        StockBalance.objects.all().delete()
+        entry.product = other
+        entry.save()
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 0)
+        self.assertEqual(StockBalance.objects.get(product=other).quantity, 4)
+        StockBalance.objects.all().delete()
+        entry.delete()
+        self.assertEqual(StockBalance.objects.get(product=other).quantity, 0)
+
+    def test_concurrently_created_balance_is_not_overwritten(self):
+        StockBalance.objects.filter(product=self.product).delete()
+        compute = StockBalance.compute
+
+        def compute_while_another_movement_lands(product_ids=None):
+            totals = compute(product_ids)
+            # Another transaction's first movement (+7) creates the row in the meantime.
+            StockBalance.objects.create(product=self.product, quantity=7)
+            return totals
+
+        with mock.patch.object(StockBalance, 'compute', side_effect=compute_while_another_movement_lands):
+            StockEntry.objects.create(product=self.product, quantity=5)
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 12)
+
+
+class RebuildStockBalancesTests(TestCase):
+    """rebuild_stock_balances reports corrupted balances with --verify and fixes them otherwise."""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1', quantity=0, price=Decimal('20.00'))
+        self.other = Product.objects.create(name='Bulb', sku='BULB-1', quantity=0, price=Decimal('3.00'))
+        StockEntry.objects.create(product=self.product, quantity=10)
+        StockExit.objects.create(product=self.product, quantity=3)
+        StockEntry.objects.create(product=self.other, quantity=4)
+        StockBalance.objects.filter(product=self.product).update(quantity=99)
+        StockBalance.objects.filter(product=self.other).delete()
+
+    def test_verify_reports_without_writing(self):
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 mismatched and 1 missing stock balances.'):
+            call_command('rebuild_stock_balances', verify=True, stdout=out)
+        self.assertIn(f'Product {self.product.id}: stored 99, expected 7', out.getvalue())
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 99)
+
+    def test_rebuild_fixes_balances(self):
+        call_command('rebuild_stock_balances', stdout=io.StringIO())
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 7)
+        self.assertEqual(StockBalance.objects.get(product=self.other).quantity, 4)
+        call_command('rebuild_stock_balances', verify=True, stdout=io.StringIO())
+
+
+class GenerateDummyStockTests(TestCase):
+    """generate_dummy_stock spreads valid movements over the past, the same ones for the same seed."""
+
+    until = timezone.make_aware(datetime(2026, 3, 1))
+
+    def setUp(self):
+        Account.objects.create_user('staff@example.com', 'staff', None, role='staff', is_approved=True)
+        for i in range(3):
+            Product.objects.create(name=f'Product {i}', sku=f'DUMMY-{i}', quantity=0, price=Decimal('4.00'))
+
+    def generate(self, seed=0):
+        call_command('generate_dummy_stock', count=30, seed=seed, days=30, until='2026-03-01', stdout=io.StringIO())
+        ledger = StockManagement.objects.order_by('product_id', 'transaction_date', 'id').values_list(
+            'product_id', 'transaction_type', 'quantity', 'transaction_date', 'note',
+        )
+        adjustments = StockAdjustment.objects.order_by('product_id', 'adjustment_date', 'id').values_list(
+            'product_id', 'before', 'after', 'adjustment_date', 'reason',
+        )
+        return list(ledger), list(adjustments)
+
+    def clear(self):
+        StockManagement.objects.all().delete()
+        StockAdjustment.objects.all().delete()
+
+    def test_same_seed_same_movements(self):
+        first = self.generate()
+        self.assertEqual(len(first[0]) + len(first[1]), 90)
+        self.clear()
+        self.assertEqual(self.generate(), first)
+        self.clear()
+        self.assertNotEqual(self.generate(seed=1), first)
+
+    def test_movements_are_spread_over_the_window(self):
+        StockSnapshot.take(self.until - timedelta(days=1))
+        ledger, adjustments = self.generate()
+        dates = sorted([row[3] for row in ledger] + [row[3] for row in adjustments])
+        self.assertGreaterEqual(dates[0], self.until - timedelta(days=30))
+        self.assertLessEqual(dates[-1], self.until)
+        self.assertGreater(len({date.date() for date in dates}), 20)
+        # The snapshot predates movements now dated before it.
+        self.assertFalse(StockSnapshot.objects.exists())
+
+        # A second run continues after the existing history, so stock is never negative at any date.
+        self.generate(seed=1)
+        self.assertEqual(StockManagement.objects.count() + StockAdjustment.objects.count(), 180)
+        dates = set(StockManagement.objects.values_list('transaction_date', flat=True))
+        dates |= set(StockAdjustment.objects.values_list('adjustment_date', flat=True))
+        for at in sorted(dates)[::10]:
+            self.assertTrue(all(stock >= 0 for stock in Product.objects.with_stock_as_of(at).values_list('stock', flat=True)))
+        self.assertEqual(
+            dict(Product.objects.with_stock_as_of(self.until).values_list('id', 'stock')),
+            dict(StockBalance.objects.values_list('product_id', 'quantity')),
+        )
+
+
+class StockBulkMovementTests(TestCase):
+    """stock-bulk/ writes the valid lines in order, reports the rest and caps the lines per request."""
+
+    def setUp(self):
+        cache.clear()
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=staff).key}'}
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1', quantity=0, price=Decimal('20.00'))
+
+    def post(self, body, content_type='application/json', query=''):
+        if content_type == 'application/json':
+            body = json.dumps(body)
+        return self.client.post(f'/api/inventory/stock-bulk/{query}', body, content_type=content_type, **self.headers)
+
+    def stock(self):
+        return StockBalance.objects.get(product=self.product).quantity
+
+    def line(self, movement_type, quantity, **extra):
+        return {'type': movement_type, 'product_id': self.product.id, 'quantity': quantity, **extra}
+
+    def test_valid_batch(self):
+        # The stock-out relies on the stock-in before it in the same batch.
+        response = self.post({'movements': [self.line('in', 5), self.line('out', 3), self.line('in', 2.0)]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(self.product.transactions.count(), 3)
+
+    def test_invalid_lines_are_reported(self):
+        response = self.post([
+            self.line('in', 2), self.line('out', 5), self.line('in', 2.9), self.line('in', '1.5'),
+            self.line('out', 1, product_id=999999), self.line('sideways', 1), 'in',
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([result.get('error') for result in response.data['results']], [
+            None, 'Not enough stock to complete this operation.', 'quantity must be a positive integer.',
+            'quantity must be a positive integer.', 'Product not found.', "type must be 'in' or 'out'.",
+            'Each line must be an object.',
+        ])
+        self.assertEqual(self.stock(), 2)
+
+    def test_atomic_batch_writes_nothing_on_error(self):
+        response = self.post([self.line('in', 2), self.line('out', 5)], query='?atomic=true')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(self.stock(), 0)
+        self.assertFalse(self.product.transactions.exists())
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps(line) for line in [self.line('in', 4), self.line('out', 1)]) + '\n\n'
+        response = self.post(body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(self.post('{"type": "in"\n', content_type='application/x-ndjson').status_code, 400)
+
+    def test_line_limit(self):
+        with mock.patch.object(StockBulkMovementView, 'max_lines', 2):
+            body = '\n'.join(json.dumps(self.line('in', 1)) for _ in range(2))
+            self.assertEqual(self.post(body, content_type='application/x-ndjson').status_code, 201)
+            # The third line is refused before it is decoded.
+            response = self.post(body + '\n{not json', content_type='application/x-ndjson')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'], 'At most 2 lines per request.')
+            self.assertEqual(self.post([self.line('in', 1)] * 3).status_code, 400)
+        self.assertEqual(self.stock(), 2)
+
+
+class StockHistoryTests(TestCase):
+    """Historical stock matches the ledger, and a date alone as an upper bound covers that whole day."""
+
+    def setUp(self):
+        cache.clear()
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=staff).key}'}
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1', quantity=0, price=Decimal('20.00'))
+        for model, quantity, when in [
+            (StockEntry, 10, datetime(2026, 1, 1, 10)), (StockExit, 3, datetime(2026, 1, 2, 9)),
+            (StockEntry, 5, datetime(2026, 1, 2, 18)), (StockExit, 4, datetime(2026, 1, 3, 12)),
+        ]:
+            movement = model.objects.create(product=self.product, quantity=quantity)
+            StockManagement.objects.filter(pk=movement.pk).update(transaction_date=timezone.make_aware(when))
+
+    def ledger(self, until):
+        rows = StockManagement.objects.filter(product=self.product, transaction_date__lte=timezone.make_aware(until))
+        return rows.aggregate(total=Sum('quantity'))['total'] or 0
+
+    def stock_at(self, at):
+        response = self.client.get(f'/api/inventory/stock-at/{self.product.id}/', {'at': at}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.data['stock']
+
+    def test_as_of_a_date_includes_that_day(self):
+        for day in (1, 2, 3):
+            expected = self.ledger(datetime(2026, 1, day, 23, 59, 59))
+            self.assertEqual(self.stock_at(f'2026-01-0{day}'), expected)
+            response = self.client.get('/api/inventory/valuation/', {'as_of': f'2026-01-0{day}'}, **self.headers)
+            self.assertEqual(response.data['catalog']['units'], expected)
+        self.assertEqual([self.stock_at(f'2026-01-0{day}') for day in (1, 2, 3)], [10, 12, 8])
+        self.assertEqual(self.stock_at('2026-01-02T12:00:00'), self.ledger(datetime(2026, 1, 2, 12)))
+
+    def test_snapshots_agree_with_the_ledger(self):
+        for when in (datetime(2026, 1, 1, 12), datetime(2026, 1, 2, 12)):
+            StockSnapshot.take(timezone.make_aware(when))
+        self.assertEqual(StockSnapshot.objects.order_by('taken_at').last().quantity, self.ledger(datetime(2026, 1, 2, 12)))
+        for day in (1, 2, 3):
+            self.assertEqual(self.stock_at(f'2026-01-0{day}'), self.ledger(datetime(2026, 1, day, 23, 59, 59)))
+
+    def test_editing_history_drops_later_snapshots(self):
+        StockSnapshot.take(timezone.make_aware(datetime(2026, 1, 2, 12)))
+        later = StockManagement.objects.get(transaction_date__day=3)
+        later.quantity = -2
+        later.save()
+        self.assertTrue(StockSnapshot.objects.exists())  # Taken before the edited movement.
+        StockManagement.objects.get(transaction_date__day=1).delete()
+        self.assertFalse(StockSnapshot.objects.exists())
+        for day in (1, 2, 3):
+            self.assertEqual(self.stock_at(f'2026-01-0{day}'), self.ledger(datetime(2026, 1, day, 23, 59, 59)))
+        self.assertEqual(self.stock_at('2026-01-03'), StockBalance.objects.get(product=self.product).quantity)
+
+    def test_log_until_a_date_includes_that_day(self):
+        response = self.client.get(
+            f'/api/inventory/stock-log/{self.product.id}/', {'since': '2026-01-02', 'until': '2026-01-02'}, **self.headers,
+        )
+        self.assertEqual([(entry['type'], entry['quantity']) for entry in response.data['log']], [('out', 3), ('in', 5)])
+
+
+class ProductFilterTests(TestCase):
+    """Product list filters: category lists, inclusive price and low-stock bounds, and 400s for bad values."""
+
+    def setUp(self):
+        cache.clear()
+        self.products = {}
+        for sku, category, price, stock in [
+            ('A', 'home', '5.00', 0), ('B', 'home', '10.00', 3), ('C', 'garden', '20.00', 10), ('D', 'toys', '10.00', 4),
+        ]:
+            product = Product.objects.create(name=sku, sku=sku, quantity=0, price=Decimal(price), category=category)
+            if stock:
+                StockEntry.objects.create(product=product, quantity=stock)
+            self.products[sku] = product
+
+    def skus(self, **params):
+        response = self.client.get('/api/inventory/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(product['sku'] for product in response.data['results'])
+
+    def test_filters(self):
+        for params, expected in [
+            ({'category': 'home'}, ['A', 'B']),
+            ({'category': 'home,garden'}, ['A', 'B', 'C']),
+            ({'category': 'nonexistent'}, []),
+            ({'min_price': '10'}, ['B', 'C', 'D']),
+            ({'max_price': '10.00'}, ['A', 'B', 'D']),
+            ({'min_price': '6', 'max_price': '15'}, ['B', 'D']),
+            ({'low_stock': '3'}, ['A', 'B']),
+            ({'low_stock': '0'}, ['A']),
+            ({'category': 'home,toys', 'min_price': '10', 'low_stock': '3'}, ['B']),
+            ({'min_price': ''}, ['A', 'B', 'C', 'D']),
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.skus(**params), expected)
+
+    def test_invalid_values(self):
+        for params, error in [
+            ({'min_price': 'cheap'}, {'min_price': 'A valid number is required.'}),
+            ({'max_price': 'NaN'}, {'max_price': 'A valid number is required.'}),
+            ({'max_price': 'Infinity'}, {'max_price': 'A valid number is required.'}),
+            ({'low_stock': '1.5'}, {'low_stock': 'A valid integer is required.'}),
+            ({'low_stock': 'few'}, {'low_stock': 'A valid integer is required.'}),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/inventory/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), error)
+
+
+class GroupedProductFeedTests(TestCase):
+    """The grouped feed: top ?limit= products per category by ?order=, ties by id, empty categories left out."""
+
+    def setUp(self):
+        cache.clear()
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=staff).key}'}
+        for name, category, price in [
+            ('Apron', 'home', '10.00'), ('Broom', 'home', '5.00'), ('Cushion', 'home', '10.00'), ('Doormat', 'home', '20.00'),
+            ('Kite', 'toys', '7.00'), ('Cable', 'electronics', '3.00'), ('Adapter', 'electronics', '4.00'),
+        ]:
+            Product.objects.create(name=name, sku=name.upper(), quantity=0, price=Decimal(price), category=category)
+
+    def feed(self, **params):
+        response = self.client.get('/api/inventory/grouped/', params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return {category: [product['name'] for product in products] for category, products in response.data['data'].items()}
+
+    def test_top_products_per_category(self):
+        self.assertEqual(self.feed(limit='2'), {
+            'electronics': ['Adapter', 'Cable'], 'home': ['Apron', 'Broom'], 'toys': ['Kite'],
+        })
+        # Categories come in CATEGORY_CHOICES order and those without products are left out.
+        self.assertEqual(list(self.feed()), ['electronics', 'home', 'toys'])
+
+    def test_order(self):
+        for order, expected in [
+            ('name', ['Apron', 'Broom', 'Cushion']),
+            ('price', ['Broom', 'Apron', 'Cushion']),
+            ('-price', ['Doormat', 'Apron', 'Cushion']),
+            ('unknown', ['Apron', 'Broom', 'Cushion']),
+        ]:
+            with self.subTest(order=order):
+                self.assertEqual(self.feed(limit='3', order=order)['home'], expected)
+
+    def test_price_ties_are_broken_by_id(self):
+        Product.objects.filter(name='Doormat').update(price=Decimal('10.00'))
+        cache.clear()
+        self.assertEqual(self.feed(limit='3', order='-price')['home'], ['Apron', 'Cushion', 'Doormat'])
+
+    def test_invalid_limit_uses_the_default(self):
+        for limit in ['0', '-1', 'many', '']:
+            with self.subTest(limit=limit):
+                self.assertEqual(len(self.feed(limit=limit)['home']), 4)
+
+
+class StockMovementLogTests(TestCase):
+    """The movement log merges ledger rows and adjustments in date order, paged or streamed whole."""
+
+    def setUp(self):
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=staff).key}'}
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1', quantity=0, price=Decimal('20.00'))
+        entry = StockEntry.objects.create(product=self.product, quantity=10, note='delivery')
+        sale = StockExit.objects.create(product=self.product, quantity=3, note='sale')
+        adjustment = StockAdjustment.objects.create(product=self.product, before=7, after=5, reason='recount')
+        StockManagement.objects.filter(pk=entry.pk).update(transaction_date=timezone.make_aware(datetime(2026, 1, 1, 9)))
+        StockManagement.objects.filter(pk=sale.pk).update(transaction_date=timezone.make_aware(datetime(2026, 1, 2, 9)))
+        StockAdjustment.objects.filter(pk=adjustment.pk).update(adjustment_date=timezone.make_aware(datetime(2026, 1, 3, 9)))
+        self.url = f'/api/inventory/stock-log/{self.product.id}/'
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'export': 'csv', 'since': '2026-01-02'}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="stock-log-{self.product.id}.csv"')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'type,quantity,before,after,date,reason,performed_by',
+            'out,3,,,2026-01-02 09:00:00+00:00,sale,',
+            'adjust,,7,5,2026-01-03 09:00:00+00:00,recount,',
+        ])
+
+    def test_pages_follow_the_cursor(self):
+        log, url = [], f'{self.url}?page_size=2'
+        while url:
+            response = self.client.get(url, **self.headers)
+            self.assertEqual(response.status_code, 200)
+            log += [entry['type'] for entry in response.data['log']]
+            url = response.data['next']
+        self.assertEqual(log, ['in', 'out', 'adjust'])
+
+    def test_invalid_parameters(self):
+        for prefix in ('', 'async/'):
+            url = f'/api/inventory/{prefix}stock-log/{self.product.id}/'
+            for params, error in [
+                ({'since': 'yesterday'}, 'since must be an ISO date or datetime.'),
+                ({'until': '2026-13-01'}, 'until must be an ISO date or datetime.'),
+                ({'cursor': 'not-a-cursor'}, 'Invalid cursor.'),
+            ]:
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params, **self.headers)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json(), {'error': error})
+
+
+class InventoryValuationTests(TestCase):
+    """Valuation totals and discounts per category match the products' prices, stock and active coupons."""
+
+    def setUp(self):
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=staff).key}'}
+        ten = Coupon.objects.create(code='TEN', discount_percent=Decimal('10'))
+        half = Coupon.objects.create(code='HALF', discount_percent=Decimal('50'), active=False)
+        quarter = Coupon.objects.create(code='QUARTER', discount_percent=Decimal('25'))
+        for name, category, price, coupon, stock in [
+            ('Lamp', 'home', '19.99', ten, 3), ('Bulb', 'home', '2.50', half, 10),
+            ('Hose', 'garden', '15.00', quarter, 4), ('Rake', 'garden', '7.25', None, 0),
+        ]:
+            product = Product.objects.create(
+                name=name, sku=name.upper(), quantity=0, price=Decimal(price), category=category, coupon=coupon,
+            )
+            if stock:
+                StockEntry.objects.create(product=product, quantity=stock)
+
+    def test_totals_and_discounts(self):
+        response = self.client.get('/api/inventory/valuation/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['categories'], [
+            {
+                'category': 'garden', 'label': 'Garden', 'products': 2, 'units': 4,
+                'total': Decimal('60.00'), 'discount': Decimal('15.00'), 'final_total': Decimal('45.00'),
+            },
+            {
+                # 10% of 3 x 19.99 is 5.997; the inactive coupon on the bulbs gives nothing.
+                'category': 'home', 'label': 'Home', 'products': 2, 'units': 13,
+                'total': Decimal('84.97'), 'discount': Decimal('6.00'), 'final_total': Decimal('78.97'),
+            },
+        ])
+        self.assertEqual(response.data['catalog'], {
+            'products': 4, 'units': 17, 'total': Decimal('144.97'), 'discount': Decimal('21.00'),
+            'final_total': Decimal('123.97'),
+        })
+        expected = sum(product.total_value()['final_total'] for product in Product.objects.all())
+        self.assertAlmostEqual(float(response.data['catalog']['final_total']), expected, places=1)
+
+    def test_csv_export(self):
+        response = self.client.get('/api/inventory/valuation/', {'export': 'csv'}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response.content.decode().splitlines(), [
+            'category,label,products,units,total,discount,final_total',
+            'garden,Garden,2,4,60.00,15.00,45.00',
+            'home,Home,2,13,84.97,6.00,78.97',
+            'all,Catalog,4,17,144.97,21.00,123.97',
+        ])
+        out = io.StringIO()
+        call_command('valuation_report', csv=True, stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), response.content.decode().splitlines())
+
+
+class QueryBudgetTests(TestCase):
+    """Read endpoints must issue the same number of queries however many rows they return."""
+
+    def setUp(self):
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=staff).key}')
+        self.product = self.add_products(1)[0]
+
+    def add_products(self, count):
+        products = []
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'Product {Product.objects.count()}', sku=f'SKU-BUDGET-{Product.objects.count()}',
+                quantity=0, price=Decimal('10.00'), category=Product.CATEGORY_CHOICES[i % 3][0],
+            )
+            StockEntry.objects.create(product=product, quantity=5)
+            ProductModification.objects.create(product=product, modified_by='staff', change_description='Created')
+            products.append(product)
+        return products
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def assertConstantQueries(self, url, grow):
+        before = self.count_queries(url)
+        grow()
+        self.assertEqual(self.count_queries(url), before)
+
+    def test_product_list(self):
+        self.assertConstantQueries('/api/inventory/', lambda: self.add_products(10))
+
+    def test_product_list_with_stock(self):
+        self.assertConstantQueries('/api/inventory/with-stock/', lambda: self.add_products(10))
+
+    def test_product_modification_list(self):
+        self.assertConstantQueries('/api/inventory/modifications/', lambda: self.add_products(10))
+
+    def test_grouped_product_feed(self):
+        self.assertConstantQueries('/api/inventory/grouped/', lambda: self.add_products(10))
+
+    def test_stock_as_of_list(self):
+        self.assertConstantQueries('/api/inventory/stock-at/', lambda: self.add_products(10))
+
+    def test_inventory_valuation(self):
+        self.assertConstantQueries('/api/inventory/valuation/', lambda: self.add_products(10))
+
+    def test_stock_movement_log(self):
+        def grow():
+            for _ in range(10):
+                StockExit.objects.create(product=self.product, quantity=1)
+                StockEntry.objects.create(product=self.product, quantity=1)
+        self.assertConstantQueries(f'/api/inventory/stock-log/{self.product.id}/', grow)
+
+
+class CatalogCacheTests(TestCase):
+    """Catalog responses carry validators, answer 304 when current and change once a write commits."""
+
+    def setUp(self):
+        cache.clear()
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=staff).key}')
+        self.coupon = Coupon.objects.create(code='SAVE10', discount_percent=Decimal('10'))
+        self.product = Product.objects.create(name='Lamp', sku='LAMP-1', quantity=0, price=Decimal('20.00'), coupon=self.coupon)
+        Product.objects.create(name='Bulb', sku='BULB-1', quantity=0, price='3.00')
+        self.url = f'/api/inventory/{self.product.id}/'
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        return response['ETag']
+
+    def assertInvalidatedOnCommit(self, write):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks() as callbacks:
+            write()
+            # Until the write commits, readers must keep getting the old version.
+            self.assertEqual(self.etag(), etag)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_not_modified(self):
+        etag = self.etag()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_product_write(self):
+        def write():
+            self.product.name = 'Desk lamp'
+            self.product.save()
+        self.assertInvalidatedOnCommit(write)
+        self.assertEqual(self.client.get(self.url).data['name'], 'Desk lamp')
+
+    def test_stock_write(self):
+        self.assertInvalidatedOnCommit(lambda: StockEntry.objects.create(product=self.product, quantity=5))
+
+    def test_coupon_write(self):
+        def write():
+            self.coupon.discount_percent = Decimal('20')
+            self.coupon.save()
+        self.assertInvalidatedOnCommit(write)
+        # Deleting detaches the products before post_delete; they must be invalidated all the same.
+        self.assertInvalidatedOnCommit(self.coupon.delete)
+
+    def test_host_is_part_of_the_key(self):
+        for host in ('a.example.com', 'b.example.com'):
+            response = self.client.get('/api/inventory/?page_size=1', HTTP_HOST=host)
+            self.assertTrue(response.data['next'].startswith(f'http://{host}/'))
+
+
+class AsyncReadEndpointTests(TestCase):
+    """The async/ endpoints must return what their DRF counterparts return."""
+
+    def setUp(self):
+        staff = Account.objects.create_user('staff@example.com', 'staff', 'test12345', role='staff', is_approved=True)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=staff).key}')
+        for i in range(7):
+            product = Product.objects.create(
+                name=f'Product {i % 3}', sku=f'SKU-ASYNC-{i}', quantity=0, price=Decimal(i + 1),
+                category=Product.CATEGORY_CHOICES[i % 3][0],
+            )
+            StockEntry.objects.create(product=product, quantity=10)
+            StockExit.objects.create(product=product, quantity=i + 1)
+        self.product = product
+
+    def walk(self, url, key):
+        """Follow next links from ``url``, returning every item under ``key``."""
+        items = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            items += response.json()[key]
+            url = response.json()['next']
+        return items
+
+    def test_paginated_endpoints_match(self):
+        for path, key in [
+            ('?page_size=2&ordering=-name', 'results'),
+            ('?page_size=2&fields=name,price&category=' + Product.CATEGORY_CHOICES[0][0], 'results'),
+            ('with-stock/?page_size=3&ordering=name', 'results'),
+            (f'stock-log/{self.product.id}/?page_size=1', 'log'),
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(
+                    self.walk(f'/api/inventory/async/{path}', key), self.walk(f'/api/inventory/{path}', key),
+                )
+
+    def test_detail_and_grouped_feed_match(self):
+        for path in [f'{self.product.id}/', 'grouped/?limit=2']:
+            with self.subTest(path=path):
+                self.assertEqual(
+                    self.client.get(f'/api/inventory/async/{path}').json(),
+                    self.client.get(f'/api/inventory/{path}').json(),
+                )
+
+    def test_permissions(self):
+        customer = Account.objects.create_user('user@example.com', 'user', 'test12345')
+        customer_client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=customer).key}')
+        self.assertEqual(Client().get('/api/inventory/async/').status_code, 200)
+        self.assertEqual(Client().get(f'/api/inventory/async/{self.product.id}/').status_code, 401)
+        self.assertEqual(Client(HTTP_AUTHORIZATION='Token invalid').get('/api/inventory/async/').status_code, 401)
+        self.assertEqual(customer_client.get('/api/inventory/async/with-stock/').status_code, 403)
+        self.assertEqual(self.client.post('/api/inventory/async/').status_code, 405)
+
+
+class ImageRenditionTests(TestCase):
+    """Product images get thumbnail and medium renditions, exposed once they match the image."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def upload(self, name, size):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_renditions(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/inventory/', {
+                'name': 'Lamp', 'sku': 'LAMP-1', 'quantity': 0, 'price': '5.00', 'image': self.upload('lamp.jpg', (1600, 900)),
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['image_renditions'])
+        product = Product.objects.get(pk=response.data['id'])
+        self.assertEqual(product.image_renditions, {})  # Rendering is scheduled, not done in the request.
+        self.assertTrue(callbacks)
+        generate_renditions(product.pk)
+        product.refresh_from_db()
+        sizes = {
+            (name, extension): Image.open(default_storage.open(storage_name)).size
+            for name, formats in product.image_renditions.items() if name != 'source'
+            for extension, storage_name in formats.items()
+        }
+        self.assertEqual(sizes, {
+            ('thumbnail', 'webp'): (200, 200), ('thumbnail', 'jpeg'): (200, 200),
+            ('medium', 'webp'): (800, 450), ('medium', 'jpeg'): (800, 450),
+        })
+        urls = ProductSerializer(product).data['image_renditions']
+        self.assertTrue(urls['thumbnail']['webp'].endswith(f'{PurePosixPath(product.image.name).stem}-thumbnail.webp'))
+
+        old_files = rendition_names(product.image_renditions)
+        product.image = self.upload('lamp2.jpg', (300, 300))
+        product.save()
+        self.assertIsNone(ProductSerializer(product).data['image_renditions'])
+        generate_renditions(product.pk)
+        product.refresh_from_db()
+        self.assertFalse(set(old_files) & set(rendition_names(product.image_renditions)))
+        # The old image's renditions are deleted with its blob (see ContentAddressedMediaTests).
+        self.assertTrue(all(default_storage.exists(name) for name in old_files))
+
+
+@override_settings(MEDIA_GC_GRACE_SECONDS=0)
+class ContentAddressedMediaTests(TestCase):
+    """Identical product images are stored once and deleted with their last product."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        # Renditions would be made by background threads, outside the test's transaction.
+        self.enterContext(mock.patch('inventory.signals.schedule_renditions'))
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'blue').save(buffer, 'JPEG')
+        self.photo = buffer.getvalue()
+
+    def create(self, sku, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/inventory/', {
+                'name': sku, 'sku': sku, 'quantity': 0, 'price': '5.00',
+                'image': SimpleUploadedFile(f'{sku}.JPG', content, content_type='image/jpeg'),
+            })
+        self.assertEqual(response.status_code, 201)
+        return Product.objects.get(pk=response.data['id'])
+
+    def test_shared_image_is_stored_once(self):
+        first, second = self.create('A', self.photo), self.create('B', self.photo)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^product_images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.name, blob.ref_count, blob.size), (first.image.name, 2, len(self.photo)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        self.assertTrue(default_storage.exists(second.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(default_storage.exists(second.image.name))
+
+    def test_renditions_are_shared_and_released_with_the_blob(self):
+        first, second = self.create('A', self.photo), self.create('B', self.photo)
+        with mock.patch('inventory.images.Image.open', wraps=Image.open) as decoded:
+            generate_renditions(first.pk)
+            generate_renditions(second.pk)
+        self.assertEqual(decoded.call_count, 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        files = rendition_names(first.image_renditions)
+        self.assertEqual(files, rendition_names(second.image_renditions))
+        digest = MediaBlob.objects.get().sha256
+        self.assertTrue(all(name.startswith(f'product_images/renditions/{digest[:2]}/{digest}-') for name in files))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(default_storage.exists(name) for name in files))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in files))
+
+    def test_replaced_image_is_released(self):
+        product = self.create('A', self.photo)
+        old_name = product.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = SimpleUploadedFile('other.jpg', self.photo + b'\0')
+            product.save()
+        self.assertEqual(list(MediaBlob.objects.values_list('name', 'ref_count')), [(product.image.name, 1)])
+        self.assertFalse(default_storage.exists(old_name))
+
+    def test_gc_media(self):
+        product = self.create('A', self.photo)
+        generate_renditions(product.pk)
+        product.refresh_from_db()
+        Product.objects.filter(pk=product.pk).update(image='')  # No signals, so the blob is left behind.
+        call_command('gc_media', stdout=io.StringIO())
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(default_storage.exists(product.image.name))
+        self.assertFalse(any(default_storage.exists(name) for name in rendition_names(product.image_renditions)))
+
+
+class ProductSearchTests(TestCase):
+    """Search matches every word as a prefix and ranks name matches above description matches."""
+
+    def setUp(self):
+        cache.clear()
+        search._state = None  # Built from an earlier test's (rolled back) products.
+        self.desk_lamp = Product.objects.create(name='Desk lamp', sku='LAMP-1', quantity=0, price='20.00', category='home')
+        self.bulb = Product.objects.create(
+            name='LED bulb', sku='BULB-1', quantity=0, price='3.00', category='home', description='Fits any desk lamp.',
+        )
+        Product.objects.create(name='Garden hose', sku='HOSE-1', quantity=0, price='15.00', category='garden')
+
+    def search(self, query):
+        response = self.client.get('/api/inventory/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.data['results']]
+
+    def test_ranking_and_prefixes(self):
+        self.assertEqual(self.search('lamp'), [self.desk_lamp.id, self.bulb.id])
+        self.assertEqual(self.search('DES LA'), [self.desk_lamp.id, self.bulb.id])
+        self.assertEqual(self.search('bulb-1'), [self.bulb.id])
+        self.assertEqual(self.search('gard'), [Product.objects.get(sku='HOSE-1').id])
+        self.assertEqual(self.search('lamp hose'), [])
+        self.assertEqual(self.client.get('/api/inventory/search/', {'q': ' - '}).status_code, 400)
+
+    def test_follows_product_changes(self):
+        self.assertEqual(self.search('lantern'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk_lamp.name = 'Desk lantern'
+            self.desk_lamp.save()
+        self.assertEqual(self.search('lantern'), [self.desk_lamp.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulb.delete()
+        self.assertEqual(self.search('bulb'), [])
+        self.assertEqual(self.search('desk'), [self.desk_lamp.id])
+
+    def test_catches_up_with_updates_that_skip_save(self):
+        self.assertEqual(self.search('desk'), [self.desk_lamp.id, self.bulb.id])
+        Product.objects.filter(pk=self.bulb.pk).update(name='Night light', description='')
+        search.update_search_vectors(Product.objects.filter(pk=self.bulb.pk))
+        cache.clear()
+        self.assertEqual(self.search('night'), [self.bulb.id])
+        self.assertEqual(self.search('desk'), [self.desk_lamp.id])
+
+    def test_updates_leave_the_searched_index_unchanged(self):
+        lamp = {'id': 1, 'name': 'Desk lamp', 'sku': 'LAMP-1', 'category': 'home', 'description': ''}
+        index = search.InvertedIndex([lamp])
+        updated = index.replaced({1: None, 2: {**lamp, 'id': 2, 'name': 'Desk lantern'}})
+        self.assertEqual(index.search(['lan'], 10), [])
+        self.assertEqual(index.search(['desk'], 10), [1])
+        self.assertEqual(updated.search(['lan'], 10), [2])
+        self.assertEqual(updated.search(['desk'], 10), [2])
@@ -3,18 +3,36 @@ from .views import (
     ProductListCreateView,
     ProductRetrieveUpdateDestroyView,
     ProductModificationListView,
+    ProductSearchView,
+    GroupedProductFeedView,
     StockEntryCreateView,
     StockExitCreateView,
+    StockBulkMovementView,
     StockMovementLogView,
     ProductListWithStockView,
+    StockAsOfView,
+    InventoryValuationView,
 )
+from . import async_views
 
 urlpatterns = [
     path('', ProductListCreateView.as_view(), name='product-list-create'),
     path('<int:pk>/', ProductRetrieveUpdateDestroyView.as_view(), name='product-detail'),
     path('modifications/', ProductModificationListView.as_view(), name='product-modification-list'),
+    path('search/', ProductSearchView.as_view(), name='product-search'),
+    path('grouped/', GroupedProductFeedView.as_view(), name='product-grouped-feed'),
     path('stock-in/', StockEntryCreateView.as_view(), name='stock-entry-create'),
     path('stock-out/', StockExitCreateView.as_view(), name='stock-exit-create'),
+    path('stock-bulk/', StockBulkMovementView.as_view(), name='stock-bulk-create'),
     path('stock-log/<int:product_id>/', StockMovementLogView.as_view(), name='stock-movement-log'),
     path('with-stock/', ProductListWithStockView.as_view(), name='product-list-with-stock'),
+    path('stock-at/', StockAsOfView.as_view(), name='stock-as-of-list'),
+    path('stock-at/<int:product_id>/', StockAsOfView.as_view(), name='stock-as-of'),
+    path('valuation/', InventoryValuationView.as_view(), name='inventory-valuation'),
+    # Async read endpoints for ASGI deployments; same data as the routes above.
+    path('async/', async_views.product_list, name='async-product-list'),
+    path('async/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/grouped/', async_views.grouped_product_feed, name='async-product-grouped-feed'),
+    path('async/with-stock/', async_views.product_list_with_stock, name='async-product-list-with-stock'),
+    path('async/stock-log/<int:product_id>/', async_views.stock_movement_log, name='async-stock-movement-log'),
 ]
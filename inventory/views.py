@@ -1,11 +1,31 @@
+import csv
+import itertools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated, BasePermission
+from inventract_backend.middleware import serialized
 
-from .models import Product, ProductModification, StockEntry, StockExit, StockAdjustment
+from .models import Product, ProductModification, StockEntry, StockExit
 from .serializers import ProductSerializer, ProductModificationSerializer
+from .pagination import ProductCursorPagination
+from .filters import filter_products
+from .search import search_products, words
+from .cache import CATALOG_VERSION_KEY, cached_response, product_version_key
+from .parsers import NDJSONParser
+from .bulk import StockMovementBatch
+from .reports import valuation, write_valuation_csv
+from .movements import FIELDS, EchoBuffer, decode_cursor, encode_cursor, log_entry, movement_log, parse_bound
 
 
 class IsStaffUser(BasePermission):
@@ -17,19 +37,23 @@ class ProductListCreateView(APIView):
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def get(self, request):
-        category = request.query_params.get('category')
-        if category:
-            products = Product.objects.filter(category=category)
-        else:
-            products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return cached_response(request, CATALOG_VERSION_KEY, lambda: self.list_products(request))
+
+    def list_products(self, request):
+        fields = ProductSerializer.requested_fields(request.query_params)
+        products = filter_products(Product.objects.all(), request.query_params)
+        if fields:
+            products = products.only(*ProductSerializer.model_fields(fields))
+        paginator = ProductCursorPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
+        serializer = ProductSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serialized(serializer)).data
 
     def post(self, request):
         serializer = ProductSerializer(data=request.data)
         if serializer.is_valid():
             product = serializer.save()
-            return Response(ProductSerializer(product).data, status=status.HTTP_201_CREATED)
+            return Response(serialized(ProductSerializer(product)), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ProductRetrieveUpdateDestroyView(APIView):
@@ -40,11 +64,13 @@ class ProductRetrieveUpdateDestroyView(APIView):
             return None
 
     def get(self, request, pk):
+        return cached_response(request, product_version_key(pk), lambda: self.retrieve_product(pk))
+
+    def retrieve_product(self, pk):
         product = self.get_object(pk)
         if not product:
-            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            raise NotFound()
+        return serialized(ProductSerializer(product))
 
     def put(self, request, pk):
         product = self.get_object(pk)
@@ -58,7 +84,7 @@ class ProductRetrieveUpdateDestroyView(APIView):
                 modified_by=request.data.get('modified_by', 'unknown'),
                 change_description=request.data.get('change_description', 'Updated product')
             )
-            return Response(ProductSerializer(instance).data, status=status.HTTP_200_OK)
+            return Response(serialized(ProductSerializer(instance)), status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, pk):
@@ -73,7 +99,7 @@ class ProductRetrieveUpdateDestroyView(APIView):
                 modified_by=request.data.get('modified_by', 'unknown'),
                 change_description=request.data.get('change_description', 'Partially updated product')
             )
-            return Response(ProductSerializer(instance).data, status=status.HTTP_200_OK)
+            return Response(serialized(ProductSerializer(instance)), status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
@@ -90,18 +116,70 @@ class ProductRetrieveUpdateDestroyView(APIView):
 
 class ProductModificationListView(APIView):
     def get(self, request):
-        modifications = ProductModification.objects.all()
+        modifications = ProductModification.objects.select_related('product')
         serializer = ProductModificationSerializer(modifications, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serialized(serializer), status=status.HTTP_200_OK)
+
+class ProductSearchView(APIView):
+    """
+    Products matching ?q=, best match first (see inventory.search). Every word
+    matches as a prefix of a word in the name, sku, description or category,
+    so partial input works for typeahead. ?limit= caps the results (default
+    20, max 100) and ?fields= picks the returned fields.
+    """
+    permission_classes = []
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        if not words(request.query_params.get('q')):
+            return Response({'error': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        return cached_response(request, CATALOG_VERSION_KEY, lambda: self.search(request.query_params))
+
+    def search(self, params):
+        limit = params.get('limit', '')
+        limit = min(int(limit), self.max_limit) if limit.isdigit() and int(limit) > 0 else self.default_limit
+        fields = ProductSerializer.requested_fields(params)
+        products = Product.objects.all()
+        if fields:
+            products = products.only(*ProductSerializer.model_fields(fields))
+        results = search_products(products, params['q'], limit)
+        return {'query': params['q'], 'results': serialized(ProductSerializer(results, many=True, fields=fields))}
 
 class GroupedProductFeedView(APIView):
+    """
+    Products grouped by category, top ?limit= per category (default 10, max 100)
+    by ?order= name, price or -price. Empty categories are left out.
+    """
+    default_limit = 10
+    max_limit = 100
+    orderings = {'name': ('name', 'id'), 'price': ('price', 'id'), '-price': ('-price', 'id')}
+
     def get(self, request):
-        grouped = {}
-        for cat, _ in Product.CATEGORY_CHOICES:
-            products = Product.objects.filter(category=cat)
-            serializer = ProductSerializer(products, many=True)
-            grouped[cat] = serializer.data
-        return Response({"success": True, "data": grouped}, status=status.HTTP_200_OK)
+        return cached_response(request, CATALOG_VERSION_KEY, lambda: self.grouped_products(request))
+
+    def grouped_products(self, request):
+        return self.group(serialized(ProductSerializer(self.ranked_products(request.query_params), many=True)))
+
+    @classmethod
+    def ranked_products(cls, params):
+        limit = params.get('limit', '')
+        limit = min(int(limit), cls.max_limit) if limit.isdigit() and int(limit) > 0 else cls.default_limit
+        ordering = cls.orderings.get(params.get('order'), cls.orderings['name'])
+        order_by = [F(field[1:]).desc() if field.startswith('-') else F(field).asc() for field in ordering]
+        # One query: rank products within their category and keep the top ones.
+        return Product.objects.annotate(
+            rank=Window(RowNumber(), partition_by=F('category'), order_by=order_by),
+        ).filter(rank__lte=limit).order_by('category', 'rank')
+
+    @staticmethod
+    def group(products):
+        """Group serialized products by category, in category order."""
+        by_category = {}
+        for product in products:
+            by_category.setdefault(product['category'], []).append(product)
+        grouped = {cat: by_category[cat] for cat, _ in Product.CATEGORY_CHOICES if cat in by_category}
+        return {"success": True, "data": grouped}
 
 class StockEntryCreateView(APIView):
     permission_classes = [IsStaffUser]  # Allow any user to add stock (customize as needed)
@@ -112,16 +190,22 @@ class StockEntryCreateView(APIView):
         performed_by = request.data.get('performed_by')  # Optional: user id
         if not product_id or not quantity:
             return Response({'error': 'product_id and quantity are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not str(quantity).isdigit() or int(quantity) <= 0:
+            return Response({'error': 'quantity must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            product = Product.objects.get(id=product_id)
+            # The ledger row is priced from the product and its coupon.
+            product = Product.objects.select_related('coupon').get(id=product_id)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
-        entry = StockEntry.objects.create(
-            product=product,
-            quantity=quantity,
-            reason=reason,
-            performed_by_id=performed_by
-        )
+        try:
+            entry = StockEntry.objects.create(
+                product=product,
+                quantity=int(quantity),
+                reason=reason,
+                performed_by_id=performed_by
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'message': 'Stock added successfully.', 'entry_id': entry.id}, status=status.HTTP_201_CREATED)
 
 class StockExitCreateView(APIView):
@@ -133,69 +217,166 @@ class StockExitCreateView(APIView):
         performed_by = request.data.get('performed_by')  # Optional: user id
         if not product_id or not quantity:
             return Response({'error': 'product_id and quantity are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not str(quantity).isdigit() or int(quantity) <= 0:
+            return Response({'error': 'quantity must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            product = Product.objects.get(id=product_id)
+            # The ledger row is priced from the product and its coupon.
+            product = Product.objects.select_related('coupon').get(id=product_id)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
-        exit = StockExit.objects.create(
-            product=product,
-            quantity=quantity,
-            reason=reason,
-            performed_by_id=performed_by
-        )
+        try:
+            exit = StockExit.objects.create(
+                product=product,
+                quantity=int(quantity),
+                reason=reason,
+                performed_by_id=performed_by
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'message': 'Stock removed successfully.', 'exit_id': exit.id}, status=status.HTTP_201_CREATED)
 
+class StockBulkMovementView(APIView):
+    """
+    Record many stock-in/stock-out lines in one request, as a JSON array (or
+    {"movements": [...]}) or an NDJSON body. Valid lines are written and
+    invalid ones reported; pass ?atomic=true to reject the whole batch
+    when any line fails.
+    """
+    permission_classes = [IsStaffUser]
+    parser_classes = [JSONParser, NDJSONParser]
+    max_lines = 10000
+
+    def post(self, request):
+        lines = request.data.get('movements') if isinstance(request.data, dict) else request.data
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': 'A non-empty list of movements is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(lines) > self.max_lines:
+            return Response({'error': f'At most {self.max_lines} movements per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        all_or_nothing = request.query_params.get('atomic') in ('true', '1')
+        batch = StockMovementBatch(lines)
+        results = batch.process(all_or_nothing=all_or_nothing)
+        if batch.has_errors and all_or_nothing:
+            return Response({'created': 0, 'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'created': len(batch.accepted), 'results': results},
+            status=status.HTTP_207_MULTI_STATUS if batch.has_errors else status.HTTP_201_CREATED,
+        )
+
 class StockMovementLogView(APIView):
+    """
+    A product's stock movements in date order, optionally limited to
+    ?since= / ?until= (ISO dates or datetimes). Results are cursor-paginated;
+    ?export=ndjson or ?export=csv streams the whole window instead.
+    """
     permission_classes = [IsStaffUser]
+    page_size = 100
+    max_page_size = 1000
+
     def get(self, request, product_id):
         try:
-            product = Product.objects.get(id=product_id)
+            product = Product.objects.only('id', 'name').get(id=product_id)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
-        entries = product.stock_entries.all()
-        exits = product.stock_exits.all()
-        adjustments = product.stock_adjustments.all()
-        log = []
-        for entry in entries:
-            log.append({
-                'type': 'in',
-                'quantity': entry.quantity,
-                'date': entry.entry_date,
-                'reason': entry.reason,
-                'performed_by': entry.performed_by_id
-            })
-        for exit in exits:
-            log.append({
-                'type': 'out',
-                'quantity': exit.quantity,
-                'date': exit.exit_date,
-                'reason': exit.reason,
-                'performed_by': exit.performed_by_id
-            })
-        for adj in adjustments:
-            log.append({
-                'type': 'adjust',
-                'before': adj.before,
-                'after': adj.after,
-                'date': adj.adjustment_date,
-                'reason': adj.reason,
-                'performed_by': adj.performed_by_id
-            })
-        log.sort(key=lambda x: x['date'])
-        return Response({'product': product.name, 'log': log}, status=status.HTTP_200_OK)
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.query_params.get(name)
+            if value:
+                bounds[name] = parse_bound(value, upper=name == 'until')
+                if bounds[name] is None:
+                    return Response({'error': f'{name} must be an ISO date or datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        export = request.query_params.get('export')
+        if export in ('ndjson', 'csv'):
+            return self.stream(product, movement_log(product.id, **bounds), export)
+
+        cursor = None
+        if request.query_params.get('cursor'):
+            cursor = decode_cursor(request.query_params['cursor'])
+            if cursor is None:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = request.query_params.get('page_size', '')
+        page_size = min(int(page_size), self.max_page_size) if page_size.isdigit() and int(page_size) > 0 else self.page_size
+
+        rows = list(movement_log(product.id, cursor=cursor, **bounds)[:page_size + 1])
+        next_url = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(rows[-1]))
+        log = [log_entry(row) for row in rows]
+        return Response({'product': product.name, 'log': log, 'next': next_url}, status=status.HTTP_200_OK)
+
+    def stream(self, product, rows, export):
+        entries = (log_entry(row) for row in rows.iterator(chunk_size=2000))
+        if export == 'ndjson':
+            lines = (json.dumps(entry, cls=DjangoJSONEncoder) + '\n' for entry in entries)
+            response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        else:
+            writer = csv.writer(EchoBuffer())
+            header = [writer.writerow(FIELDS)]
+            lines = (writer.writerow([entry.get(field, '') for field in FIELDS]) for entry in entries)
+            response = StreamingHttpResponse(itertools.chain(header, lines), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="stock-log-{product.id}.{export}"'
+        return response
+
+class StockAsOfView(APIView):
+    """
+    Stock as it stood at ?at= (ISO date or datetime, default now), for one
+    product or a cursor-paginated page of the catalog. Only movements after
+    the nearest StockSnapshot are replayed.
+    """
+    permission_classes = [IsStaffUser]
+
+    def get(self, request, product_id=None):
+        at = timezone.now()
+        if request.query_params.get('at'):
+            at = parse_bound(request.query_params['at'], upper=True)
+            if at is None:
+                return Response({'error': 'at must be an ISO date or datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+        products = Product.objects.with_stock_as_of(at).values('id', 'name', 'sku', 'stock', 'snapshot_at')
+        if product_id is not None:
+            product = products.filter(id=product_id).first()
+            if product is None:
+                return Response({'error': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'at': at, **product}, status=status.HTTP_200_OK)
+        paginator = ProductCursorPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
+        response = paginator.get_paginated_response(page)
+        response.data['at'] = at
+        return response
+
+class InventoryValuationView(APIView):
+    """Stock valuation per category and for the catalog, optionally ?as_of= a past date; ?export=csv for CSV."""
+    permission_classes = [IsStaffUser]
+
+    def get(self, request):
+        as_of = None
+        if request.query_params.get('as_of'):
+            as_of = parse_bound(request.query_params['as_of'], upper=True)
+            if as_of is None:
+                return Response({'error': 'as_of must be an ISO date or datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+        report = valuation(as_of)
+        if request.query_params.get('export') == 'csv':
+            response = HttpResponse(content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="valuation.csv"'
+            write_valuation_csv(report, response)
+            return response
+        return Response(report, status=status.HTTP_200_OK)
 
 class ProductListWithStockView(APIView):
     permission_classes = [IsStaffUser]
     def get(self, request):
-        products = Product.objects.all()
+        products = Product.objects.with_stock().values('id', 'name', 'sku', 'stock', 'price', 'category')
+        paginator = ProductCursorPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
         data = []
-        for product in products:
+        for product in page:
             data.append({
-                'id': product.id,
-                'name': product.name,
-                'sku': product.sku,
-                'current_stock': product.current_stock(),
-                'price': str(product.price),
-                'category': product.category
+                'id': product['id'],
+                'name': product['name'],
+                'sku': product['sku'],
+                'current_stock': product['stock'],
+                'price': str(product['price']),
+                'category': product['category']
             })
-        return Response(data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(data)
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventract_backend.settings')
+# Under ASGI every request runs in its own context, so persistent connections are never
+# reused and pile up until the database refuses clients. Close them after each request
+# unless configured otherwise; DB_POOL=True is the way to reuse connections here.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,98 @@
+"""
+In-process request metrics in the Prometheus text exposition format.
+
+Each worker process keeps its own counters, so scrape every process (or run one
+per container) rather than expecting a load balancer to aggregate them.
+"""
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0, 'count': 0}
+            # Buckets are stored non-cumulatively and summed on export.
+            series['buckets'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                total = 0
+                for bound, count in zip(self.buckets + ('+Inf',), series['buckets']):
+                    total += count
+                    lines.append(f'{self.name}_bucket{format_labels(labels, le=bound)} {total}')
+                lines.append(f"{self.name}_sum{format_labels(labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {series['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            lines.extend(f'{self.name}{format_labels(labels)} {value}' for labels, value in sorted(self.series.items()))
+        return lines
+
+
+def format_labels(labels, **extra):
+    """Render a tuple of (name, value) pairs, plus keyword labels, as {name="value",...}."""
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')) for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Wall time from the first middleware to the response.', LATENCY_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent executing SQL per request.', LATENCY_BUCKETS,
+)
+REQUEST_SERIALIZE_DURATION = Histogram(
+    'http_request_serialize_duration_seconds', 'Time views spent building serializer.data per request.', LATENCY_BUCKETS,
+)
+REQUEST_RENDER_DURATION = Histogram(
+    'http_request_render_duration_seconds', 'Time spent rendering the response body.', LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram('http_request_queries', 'SQL queries executed per request.', QUERY_BUCKETS)
+REQUESTS_OVER_QUERY_THRESHOLD = Counter(
+    'http_requests_over_query_threshold_total', 'Requests that executed more queries than their threshold.',
+)
+
+REGISTRY = (
+    REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_SERIALIZE_DURATION, REQUEST_RENDER_DURATION, REQUEST_QUERIES,
+    REQUESTS_OVER_QUERY_THRESHOLD,
+)
+
+
+def expose():
+    return '\n'.join(line for metric in REGISTRY for line in metric.expose()) + '\n'
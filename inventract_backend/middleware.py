@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stats of the request being served. Context variables follow a request into the
+# threads that run its sync code and async ORM calls, so one wrapper per connection
+# can attribute every query to the right request under both WSGI and ASGI.
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['db'] += time.perf_counter() - started
+        stats['queries'] += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def serialized(serializer):
+    """Return ``serializer.data``, adding the time spent building it to the request's stats."""
+    stats = current_request_stats.get()
+    if stats is None:
+        return serializer.data
+    started = time.perf_counter()
+    try:
+        return serializer.data
+    finally:
+        stats['serialize'] += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request's SQL query count, SQL time, serializer time, render
+    time and wall time. Serializer time is what views spend in ``serialized()``
+    building ``serializer.data``, including any queries it runs; render time is
+    DRF encoding the response after the view returns.
+
+    The numbers go out three ways: a Server-Timing response header (when
+    SERVER_TIMING_HEADER is on), one JSON log line per request, and the
+    histograms served at /metrics. Requests that run more queries than
+    QUERY_COUNT_THRESHOLD (or their view's entry in QUERY_COUNT_THRESHOLDS)
+    are logged as warnings and counted separately.
+
+    Place it first in MIDDLEWARE so queries made by other middleware count too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        self.report(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        self.report(request, response, stats)
+        return response
+
+    def start(self, request):
+        request._metrics = stats = {
+            'queries': 0, 'db': 0.0, 'serialize': 0.0, 'render': 0.0,
+            'started': time.perf_counter(),
+        }
+        return stats, current_request_stats.set(stats)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that step on its own.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics['render'] += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, stats):
+        stats['total'] = time.perf_counter() - stats['started']
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        threshold = settings.QUERY_COUNT_THRESHOLDS.get(view, settings.QUERY_COUNT_THRESHOLD)
+        over_threshold = stats['queries'] > threshold
+
+        labels = (('view', view), ('method', request.method))
+        metrics.REQUEST_DURATION.observe(labels, stats['total'])
+        metrics.REQUEST_DB_DURATION.observe(labels, stats['db'])
+        metrics.REQUEST_SERIALIZE_DURATION.observe(labels, stats['serialize'])
+        metrics.REQUEST_RENDER_DURATION.observe(labels, stats['render'])
+        metrics.REQUEST_QUERIES.observe(labels, stats['queries'])
+        if over_threshold:
+            metrics.REQUESTS_OVER_QUERY_THRESHOLD.inc(labels)
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f"db;dur={stats['db'] * 1000:.1f};desc=\"{stats['queries']} queries\"",
+                f"serialize;dur={stats['serialize'] * 1000:.1f}",
+                f"render;dur={stats['render'] * 1000:.1f}",
+                f"total;dur={stats['total'] * 1000:.1f}",
+            ])
+
+        line = json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': stats['queries'],
+            'db_ms': round(stats['db'] * 1000, 2),
+            'serialize_ms': round(stats['serialize'] * 1000, 2),
+            'render_ms': round(stats['render'] * 1000, 2),
+            'total_ms': round(stats['total'] * 1000, 2),
+            'query_threshold': threshold,
+            'over_query_threshold': over_threshold,
+        })
+        logger.log(logging.WARNING if over_threshold else logging.INFO, line)
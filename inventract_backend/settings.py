@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',  
@@ -59,6 +60,7 @@ AUTH_USER_MODEL = 'accounts.Account'
 
 
 MIDDLEWARE = [
+    'inventract_backend.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,20 +99,78 @@ WSGI_APPLICATION = 'inventract_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME'),
-        'USER': os.getenv('DB_USER'),
-        'PASSWORD': os.getenv('DB_PASSWORD'),
-        'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432'),
+# Set DB_ENGINE=sqlite to run against a local SQLite file (DB_NAME, default db.sqlite3)
+# instead of PostgreSQL, e.g. for benchmarks on a machine without a database server.
+
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.getenv('DB_NAME', 'db.sqlite3'),
+        }
     }
-}
+else:
+    # Connection reuse:
+    # DB_CONN_MAX_AGE      seconds a connection stays open across requests (0 closes it after each
+    #                      request, empty keeps it forever); default 60.
+    # DB_CONN_HEALTH_CHECKS  check a reused or pooled connection is alive before handing it out.
+    # DB_POOL=True         use a psycopg connection pool (pip install "psycopg[pool]") sized by
+    #                      DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE, waiting up to DB_POOL_TIMEOUT seconds
+    #                      for a free connection. Django requires CONN_MAX_AGE=0 with a pool.
+    DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+    DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+    DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME'),
+            'USER': os.getenv('DB_USER'),
+            'PASSWORD': os.getenv('DB_PASSWORD'),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else (int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE else None),
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {},
+        }
+    }
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
 
 
 
 
+# Password hashing
+# PASSWORD_HASHER picks the hasher for new and upgraded hashes: 'pbkdf2' (default) or
+# 'argon2' (pip install argon2-cffi). Hashes made by the other one keep working and
+# are rehashed on the next login, as are hashes made with different work factors.
+
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'accounts.hashers.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+]
+# Empty means Django's default iteration count.
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS') or 0) or None
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', '102400'))  # KiB
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', '8'))
+
+# Logins hash on a pool of PASSWORD_HASHING_WORKERS threads (accounts.hashing); when
+# PASSWORD_HASHING_QUEUE more are already waiting, further logins get a 503.
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS') or os.cpu_count() or 1)
+PASSWORD_HASHING_QUEUE = int(os.getenv('PASSWORD_HASHING_QUEUE', '64'))
+# Processes hashing passwords for the account import endpoint (accounts.importers), one pool per
+# web worker process, kept between imports. import_accounts uses every CPU unless given --workers.
+ACCOUNT_IMPORT_WORKERS = int(os.getenv('ACCOUNT_IMPORT_WORKERS', '2'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -130,9 +190,67 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# Set CACHE_URL (e.g. redis://localhost:6379/1) to share the cache between workers;
+# otherwise each process uses its own in-memory cache.
+
+CACHE_URL = os.getenv('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached catalog response is kept; writes invalidate it sooner.
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '300'))
+# Seconds a token's user stays cached by accounts.authentication. Account and token
+# changes invalidate it sooner, but in every worker only when the cache is shared
+# (CACHE_URL). Without one, other workers keep serving a deleted token, an inactive
+# user or an old role until their entry expires, so it defaults to a few seconds.
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', '300' if CACHE_URL else '5'))
+# Seconds the user directory keeps a total count; account writes refresh it sooner.
+ACCOUNT_COUNT_CACHE_TIMEOUT = int(os.getenv('ACCOUNT_COUNT_CACHE_TIMEOUT', '300'))
+
+
+# Request metrics (inventract_backend.middleware.RequestMetricsMiddleware)
+# Requests running more queries than the threshold are logged as warnings and counted at /metrics.
+# QUERY_COUNT_THRESHOLDS overrides it per URL name, e.g. {'stock-bulk-create': 50}.
+
+QUERY_COUNT_THRESHOLD = int(os.getenv('QUERY_COUNT_THRESHOLD', '20'))
+QUERY_COUNT_THRESHOLDS = {}
+# Server-Timing shows clients the query count and timings, so it is only sent by default with DEBUG on.
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', str(DEBUG)) == 'True'
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; without a token it is only served when DEBUG is on.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventract_backend.middleware': {
+            'handlers': ['console'],
+            # WARNING logs only the requests over their query threshold; INFO logs every request.
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -167,6 +285,20 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads larger than this stream to a temporary file in chunks instead of being held in
+# memory, and are then moved into MEDIA_ROOT without another copy.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', str(256 * 1024)))
+# Uploads are hashed as they stream in, so product images can be stored by content (inventory.storage).
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'inventory.storage.HashingTemporaryFileUploadHandler',
+]
+# Seconds an unreferenced product image is kept after its last upload, so an image whose
+# product has not been saved yet is not collected. See also the gc_media command.
+MEDIA_GC_GRACE_SECONDS = int(os.getenv('MEDIA_GC_GRACE_SECONDS', '3600'))
+# Threads generating product image renditions (inventory.images) in the background.
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', '2'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
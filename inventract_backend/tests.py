@@ -0,0 +1,98 @@
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Product
+from . import metrics
+
+
+@override_settings(SERVER_TIMING_HEADER=True, QUERY_COUNT_THRESHOLD=20, QUERY_COUNT_THRESHOLDS={})
+class RequestMetricsMiddlewareTests(TestCase):
+    """Every request is measured once and reported in the header, the log and /metrics."""
+
+    url = '/api/inventory/'
+    labels = (('view', 'product-list-create'), ('method', 'GET'))
+
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            Product.objects.create(name=f'Product {i}', sku=f'SKU-METRICS-{i}', quantity=0, price=Decimal('5.00'))
+
+    def request_line(self, level='INFO'):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('inventract_backend.middleware', level) as logs:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0], json.loads(logs.records[0].getMessage()), len(queries)
+
+    def test_reports_queries_and_timings(self):
+        response, record, line, query_count = self.request_line()
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(line['view'], 'product-list-create')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], query_count)
+        self.assertGreater(line['serialize_ms'], 0)
+        self.assertGreater(line['render_ms'], 0)
+        self.assertGreaterEqual(line['total_ms'], line['db_ms'] + line['serialize_ms'])
+        self.assertFalse(line['over_query_threshold'])
+
+        timings = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{query_count} queries"', timings['db'])
+
+    def test_cached_response_skips_serialization(self):
+        self.request_line()
+        response, record, line, query_count = self.request_line()
+        self.assertEqual(line['serialize_ms'], 0)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_turned_off(self):
+        response, record, line, query_count = self.request_line()
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(QUERY_COUNT_THRESHOLD=0)
+    def test_warns_above_the_threshold(self):
+        over = metrics.REQUESTS_OVER_QUERY_THRESHOLD.series.get(self.labels, 0)
+        response, record, line, query_count = self.request_line('WARNING')
+        self.assertEqual(record.levelname, 'WARNING')
+        self.assertTrue(line['over_query_threshold'])
+        self.assertEqual(line['query_threshold'], 0)
+        self.assertEqual(metrics.REQUESTS_OVER_QUERY_THRESHOLD.series[self.labels], over + 1)
+
+    @override_settings(QUERY_COUNT_THRESHOLD=0, QUERY_COUNT_THRESHOLDS={'product-list-create': 100})
+    def test_per_view_threshold_overrides_the_default(self):
+        response, record, line, query_count = self.request_line()
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(line['query_threshold'], 100)
+        self.assertFalse(line['over_query_threshold'])
+
+    def test_histograms_count_the_request(self):
+        before = dict(metrics.REQUEST_QUERIES.series.get(self.labels, {'count': 0, 'sum': 0}))
+        response, record, line, query_count = self.request_line()
+        after = metrics.REQUEST_QUERIES.series[self.labels]
+        self.assertEqual(after['count'], before['count'] + 1)
+        self.assertEqual(after['sum'], before['sum'] + query_count)
+
+
+class MetricsEndpointTests(TestCase):
+    @override_settings(DEBUG=False, METRICS_TOKEN=None)
+    def test_hidden_without_a_token_outside_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(DEBUG=True, METRICS_TOKEN=None)
+    def test_open_in_debug_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='scrape-secret')
+    def test_requires_the_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE http_request_queries histogram', response.content.decode())
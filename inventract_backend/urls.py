@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.http import HttpResponse
 from django.conf.urls.static import static
 from django.conf import settings
+from .views import metrics
 
     
   # if you have a home view
@@ -11,6 +12,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')), 
     path('api/inventory/', include('inventory.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
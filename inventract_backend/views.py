@@ -1,4 +1,18 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
 
 def home(request):
-    return HttpResponse("Welcome to Inventract Backend API")
\ No newline at end of file
+    return HttpResponse("Welcome to Inventract Backend API")
+
+def metrics(request):
+    """Request metrics of this process in the Prometheus text format."""
+    if not settings.METRICS_TOKEN:
+        # Closed unless a token is configured, apart from local development.
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponse(status=401)
+    return HttpResponse(request_metrics.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')